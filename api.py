@@ -0,0 +1,298 @@
+"""Versioned JSON read API over the processed state/city/store records.
+
+app.py serves these under ``/api/v1``:
+
+    /api/v1/states                                      states by store count
+    /api/v1/states/<state>/cities                       a state's cities
+    /api/v1/states/<state>/cities/<city>/stores         a city's stores
+    /api/v1/search?q=<query>&type=stores|cities|states  ranked matches
+
+Every list is paginated by ``limit`` and an opaque ``cursor``: each response
+carries the ``next_cursor`` to pass for the following page, or null on the
+last one. A cursor holds the position and key of the last item returned, so
+if a dataset reload shifts the list, paging continues after that item.
+``fields=name,slug`` returns only the given fields of each item.
+
+Items are encoded to JSON once per dataset version: the first request for a
+list encodes all its items and keeps the bytes in a ``DocumentCache``, and
+pages of it (with every field) are joined from them. orjson is used when
+installed, else the standard library encoder.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+API_PREFIX = '/api/v1'
+
+# Fields of each kind of item, in output order
+FIELDS = {
+    'states': ('name', 'slug', 'store_count', 'city_count', 'total_reviews'),
+    'cities': ('name', 'slug', 'state', 'state_slug', 'store_count', 'total_reviews'),
+    'stores': ('id', 'name', 'address', 'phone', 'website', 'photo', 'description', 'review_count', 'hours',
+               'city', 'city_slug', 'state', 'state_slug')
+}
+
+
+class APIError(ValueError):
+    """A request parameter the API can't serve; the message is shown to the client."""
+
+
+def dumps(obj):
+    """Encode ``obj`` as compact UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def store_id(store, city, state_data):
+    """Stable id of a store, from its location, name and address."""
+    source = f'{state_data.name}\0{city.name}\0{store.name}\0{store.address}'
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+def state_document(state_data):
+    return {
+        'name': state_data.name,
+        'slug': state_data.slug,
+        'store_count': state_data.store_count,
+        'city_count': state_data.city_count,
+        'total_reviews': state_data.total_reviews
+    }
+
+def city_document(city, state_data):
+    return {
+        'name': city.name,
+        'slug': city.slug,
+        'state': state_data.name,
+        'state_slug': state_data.slug,
+        'store_count': city.store_count,
+        'total_reviews': city.total_reviews
+    }
+
+def store_document(store, city, state_data):
+    return {
+        'id': store_id(store, city, state_data),
+        'name': store.name,
+        'address': store.address,
+        'phone': store.phone,
+        'website': store.website,
+        'photo': store.photo,
+        'description': store.description,
+        'review_count': store.review_count,
+        'hours': store.hours,
+        'city': city.name,
+        'city_slug': city.slug,
+        'state': state_data.name,
+        'state_slug': state_data.slug
+    }
+
+# Kind -> (document builder, cursor key builder); both take one item's tuple
+DOCUMENTS = {
+    'states': (state_document, lambda state_data: state_data.slug),
+    'cities': (city_document, lambda city, state_data: f'{state_data.slug}/{city.slug}'),
+    'stores': (store_document, store_id)
+}
+
+def parse_fields(kind, value):
+    """Return the requested fields of ``kind`` as a tuple, or None for all of them."""
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in FIELDS[kind]]
+    if unknown:
+        raise APIError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(FIELDS[kind])}")
+    return fields or None
+
+def encode_cursor(offset, key):
+    return base64.urlsafe_b64encode(dumps([offset, key])).rstrip(b'=').decode('ascii')
+
+def decode_cursor(cursor):
+    """Return the ``(offset, key)`` in a cursor, raising APIError if it is malformed."""
+    try:
+        offset, key = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        raise APIError("Invalid cursor") from None
+    if type(offset) is not int or offset < 0 or not isinstance(key, str):
+        raise APIError("Invalid cursor")
+    return offset, key
+
+
+class DocumentList:
+    """One list of API items, optionally with every item encoded up front.
+
+    ``items`` are tuples of the records a document is built from, e.g.
+    ``(store, city, state_data)``.
+    """
+
+    __slots__ = ('kind', 'items', 'encoded', 'size')
+
+    def __init__(self, kind, items, encode=True):
+        self.kind = kind
+        self.items = items
+        self.encoded = None
+        self.size = 0
+        if encode:
+            make_document = DOCUMENTS[kind][0]
+            self.encoded = [dumps(make_document(*item)) for item in items]
+            self.size = sum(len(body) for body in self.encoded)
+
+    def __len__(self):
+        return len(self.items)
+
+    def key(self, index):
+        return DOCUMENTS[self.kind][1](*self.items[index])
+
+    def resume(self, cursor):
+        """Return the position to continue from after ``cursor``."""
+        if not cursor:
+            return 0
+        offset, key = decode_cursor(cursor)
+        if 0 < offset <= len(self) and self.key(offset - 1) == key:
+            return offset
+        # The list changed since the cursor was issued; continue after the
+        # same item if it's still listed
+        for index in range(len(self)):
+            if self.key(index) == key:
+                return index + 1
+        return min(offset, len(self))
+
+    def page(self, start, limit, fields=None, extra=None):
+        """Encode the response for ``limit`` items from ``start``.
+
+        The body is ``{"data": [...], **extra, "total", "limit", "next_cursor"}``.
+        """
+        end = min(start + limit, len(self))
+        if fields is None and self.encoded is not None:
+            data = self.encoded[start:end]
+        else:
+            make_document = DOCUMENTS[self.kind][0]
+            data = []
+            for item in self.items[start:end]:
+                document = make_document(*item)
+                if fields is not None:
+                    document = {field: document[field] for field in fields}
+                data.append(dumps(document))
+
+        meta = dict(extra or {})
+        meta.update({
+            'total': len(self),
+            'limit': limit,
+            'next_cursor': encode_cursor(end, self.key(end - 1)) if end < len(self) else None
+        })
+        return b'{"data":[' + b','.join(data) + b'],' + dumps(meta)[1:]
+
+
+class DocumentCache:
+    """Thread-safe LRU of encoded ``DocumentList`` objects, bounded by bytes.
+
+    Keys include the dataset version, so lists of an old version are never
+    served and simply age out.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, version, key, build):
+        """Return the list for ``(version, key)``, calling ``build()`` on a miss."""
+        cache_key = (version, key)
+        with self._lock:
+            documents = self._entries.get(cache_key)
+            if documents is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return documents
+            self.misses += 1
+
+        documents = build()
+        if documents.size > self.max_bytes:
+            return documents
+        with self._lock:
+            previous = self._entries.pop(cache_key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[cache_key] = documents
+            self.size += documents.size
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+        return documents
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class Compressor:
+    """Compresses response bodies for clients that accept br or gzip.
+
+    Compressed bodies are remembered by ETag, so a response replayed from
+    the page cache is compressed once rather than on every request.
+    """
+
+    def __init__(self, min_bytes=1024, max_entries=512):
+        self.min_bytes = min_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def encoding(self, accept_encodings):
+        if brotli is not None and accept_encodings['br']:
+            return 'br'
+        if accept_encodings['gzip']:
+            return 'gzip'
+        return None
+
+    def _compress(self, body, encoding):
+        if encoding == 'br':
+            return brotli.compress(body, quality=5)
+        return gzip.compress(body, compresslevel=6, mtime=0)
+
+    def compress(self, response, accept_encodings):
+        """Compress ``response`` in place if it is worth it and return it."""
+        response.vary.add('Accept-Encoding')
+        if response.status_code != 200 or response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        encoding = self.encoding(accept_encodings)
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < self.min_bytes:
+            return response
+
+        etag, weak = response.get_etag()
+        key = (etag, encoding) if etag else None
+        compressed = None
+        if key is not None:
+            with self._lock:
+                compressed = self._entries.get(key)
+                if compressed is not None:
+                    self._entries.move_to_end(key)
+        if compressed is None:
+            compressed = self._compress(body, encoding)
+            if key is not None:
+                with self._lock:
+                    self._entries[key] = compressed
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        # The compressed bytes differ from the identity body the ETag was made for
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,13 +1,35 @@
-from flask import Flask, render_template, request, redirect, url_for, make_response
+from flask import (Flask, Response, render_template, request, redirect, url_for, make_response, jsonify,
+                   send_file, send_from_directory, stream_with_context, g, has_request_context, before_render_template,
+                   template_rendered)
+from flask.signals import signals_available
+from flask.logging import default_handler
+import time
 from flask_caching import Cache
 from datetime import datetime
-import pandas as pd
-import numpy as np
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import threading
 from slugify import slugify
+import hashlib
 import json
+import mimetypes
+from functools import wraps
+from snapshot import read_snapshot_meta, snapshot_paths, SNAPSHOT_FORMAT
+from records import Store, City, State, STORE_FIELDS
+from page_cache import PageCache, LRUPageStore, FlaskCachePageStore, ErrorPages
+from summary import DatasetSummary
+from reloader import Dataset, DatasetReloader, file_stamp
+from metrics import Registry, SlowRequestProfiler, process_memory
+from async_logging import setup_async_logging
+from search_index import SearchIndex, DEFAULT_PER_PAGE, DEFAULT_SUGGEST_LIMIT, MAX_PER_PAGE
+from assets import BUILD_DIR, MANIFEST_NAME, build_assets, compressed_variant, load_manifest
+from api import API_PREFIX, APIError, Compressor, DocumentCache, DocumentList, parse_fields
+from images import (SIZES as PHOTO_SIZES, DirectorySource, HTTPSource, ThumbnailCache, ThumbnailService,
+                    image_key, is_image_key, make_thumbnail, webp_supported)
+
+# Modules that need pandas, numpy or pyarrow (ingest, incremental, geo,
+# sitemaps, store_table) are imported inside the functions that build the
+# dataset, so importing this module stays cheap; see create_app().
 
 # Initialize Flask app with explicit template and static paths
 app = Flask(__name__, 
@@ -16,14 +38,76 @@ app = Flask(__name__,
 )
 app.secret_key = 'your-secret-key-here'
 
+# Serve store rows from a memory-mapped table shared by all workers instead of
+# per-worker dict copies (requires pyarrow)
+app.config['SHARED_STORE_TABLE'] = os.environ.get('SHARED_STORE_TABLE', '').lower() in ('1', 'true', 'yes')
+
+# Rendered page cache: 'lru' keeps pages in-process, 'flask' stores them in the
+# Flask-Caching backend below (e.g. CACHE_TYPE=redis or filesystem)
+app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'lru')
+app.config['PAGE_CACHE_MAX_BYTES'] = int(os.environ.get('PAGE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['PAGE_CACHE_MAX_AGE'] = int(os.environ.get('PAGE_CACHE_MAX_AGE', 300))
+# Recently missing paths answered with the cached 404 page before routing
+app.config['NOT_FOUND_CACHE_SIZE'] = int(os.environ.get('NOT_FOUND_CACHE_SIZE', 4096))
+# Stores rendered per city page and per infinite-scroll fragment; 0 renders
+# every store on one page
+app.config['CITY_PAGE_SIZE'] = int(os.environ.get('CITY_PAGE_SIZE', 24))
+# Offline gazetteer (CSV, or the Census places file) used to locate cities;
+# defaults to data/gazetteer.csv. Without it /near is unavailable and
+# nearby cities fall back to the largest in the state.
+app.config['GAZETTEER_FILE'] = os.environ.get('GAZETTEER_FILE')
+# Default and largest radius in km for /near
+app.config['NEAR_RADIUS_KM'] = float(os.environ.get('NEAR_RADIUS_KM', 25))
+app.config['MAX_NEAR_RADIUS_KM'] = float(os.environ.get('MAX_NEAR_RADIUS_KM', 500))
+# Build the dataset in create_app() rather than on the first request that
+# needs it; preloading in the master lets forked workers share it
+app.config['PRELOAD_DATA'] = os.environ.get('PRELOAD_DATA', 'true').lower() in ('1', 'true', 'yes')
+# Browser cache lifetime in seconds for static files other than the built
+# bundles, which are fingerprinted and cached for a year
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = int(os.environ.get('STATIC_MAX_AGE', 3600))
+# Font Awesome stylesheet; point at a self-hosted copy to avoid the CDN
+app.config['FONT_AWESOME_URL'] = os.environ.get(
+    'FONT_AWESOME_URL', 'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.0.0/css/all.min.css')
+# Serve store photos as cached WebP thumbnails from /img instead of linking
+# the full-size originals (requires Pillow)
+app.config['IMAGE_PROXY'] = os.environ.get('IMAGE_PROXY', 'true').lower() in ('1', 'true', 'yes')
+# Thumbnail cache location (default data/images) and size budget
+app.config['IMAGE_CACHE_DIR'] = os.environ.get('IMAGE_CACHE_DIR')
+app.config['IMAGE_CACHE_MAX_BYTES'] = int(os.environ.get('IMAGE_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+# Read photos from this directory, by file name, instead of fetching them
+app.config['IMAGE_SOURCE_DIR'] = os.environ.get('IMAGE_SOURCE_DIR')
+# Background threads producing thumbnails, per worker process
+app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', 4))
+app.config['IMAGE_FETCH_TIMEOUT'] = float(os.environ.get('IMAGE_FETCH_TIMEOUT', 10))
+# Seconds a photo that failed to fetch or decode is answered with the default image
+app.config['IMAGE_FAILURE_TTL'] = float(os.environ.get('IMAGE_FAILURE_TTL', 24 * 3600))
+# Bytes of encoded JSON API lists kept across requests, per worker
+app.config['API_DOCUMENT_CACHE_MAX_BYTES'] = int(os.environ.get('API_DOCUMENT_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+# JSON API responses smaller than this are sent uncompressed
+app.config['API_COMPRESS_MIN_BYTES'] = int(os.environ.get('API_COMPRESS_MIN_BYTES', 1024))
+# Seconds between checks for a changed data file; 0 disables hot reload
+app.config['DATA_RELOAD_INTERVAL'] = float(os.environ.get('DATA_RELOAD_INTERVAL', 30))
+# Requests slower than this many milliseconds get their stacks sampled and
+# logged; 0 disables the profiler
+app.config['PROFILE_SLOW_REQUEST_MS'] = float(os.environ.get('PROFILE_SLOW_REQUEST_MS', 0))
+# Log file rotation size and number of rotated files kept
+app.config['LOG_MAX_BYTES'] = int(os.environ.get('LOG_MAX_BYTES', 10 * 1024 * 1024))
+app.config['LOG_BACKUP_COUNT'] = int(os.environ.get('LOG_BACKUP_COUNT', 5))
+# Records below ERROR allowed per logging call site per window before the
+# rest are suppressed and counted; errors always pass. 0 disables rate limiting
+app.config['LOG_RATE_LIMIT'] = int(os.environ.get('LOG_RATE_LIMIT', 20))
+app.config['LOG_RATE_WINDOW'] = float(os.environ.get('LOG_RATE_WINDOW', 10))
+
 # Configure caching
 cache = Cache(config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 3600
+    'CACHE_TYPE': os.environ.get('CACHE_TYPE', 'simple'),
+    'CACHE_DEFAULT_TIMEOUT': 3600,
+    'CACHE_DIR': os.environ.get('CACHE_DIR'),
+    'CACHE_REDIS_URL': os.environ.get('CACHE_REDIS_URL')
 })
 cache.init_app(app)
 
-# Create required directories with absolute paths
+# Required directories with absolute paths, created by create_app()
 base_dir = os.path.abspath(os.path.dirname(__file__))
 required_dirs = [
     os.path.join(base_dir, 'logs'),
@@ -32,16 +116,62 @@ required_dirs = [
     os.path.join(base_dir, 'static', 'images')
 ]
 
-for directory in required_dirs:
-    os.makedirs(directory, exist_ok=True)
-    print(f"Verified directory: {directory}")
-
-# Configure logging with absolute path
 log_file = os.path.join(base_dir, 'logs', 'app.log')
-handler = RotatingFileHandler(log_file, maxBytes=10000, backupCount=3)
-handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
-app.logger.setLevel(logging.INFO)
+# The queue handler installed by configure_logging()
+log_handler = None
+
+def configure_logging():
+    """Send app logs through a queue to a background writer.
+    
+    Requests only queue records; a background thread writes them as JSON
+    lines to the log file and to the console in batches.
+    """
+    global log_handler
+    if log_handler is not None:
+        return
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter('[%(asctime)s] %(levelname)s in %(module)s: %(message)s'))
+    app.logger.removeHandler(default_handler)
+    log_handler = setup_async_logging(
+        [app.logger] + [logging.getLogger(name) for name in ('ingest', 'reloader', 'metrics', 'geo', 'assets', 'images')],
+        log_file,
+        max_bytes=app.config['LOG_MAX_BYTES'],
+        backup_count=app.config['LOG_BACKUP_COUNT'],
+        burst=app.config['LOG_RATE_LIMIT'],
+        window=app.config['LOG_RATE_WINDOW'],
+        extra_handlers=[console_handler]
+    )
+
+# Request and dataset metrics, served at /metrics
+metrics = Registry()
+request_count = metrics.counter('app_requests_total', 'Requests by endpoint, method and status',
+                                ['endpoint', 'method', 'status'])
+request_duration = metrics.histogram('app_request_duration_seconds', 'Total request latency',
+                                     ['endpoint', 'method'])
+handler_duration = metrics.histogram('app_handler_duration_seconds',
+                                     'Request latency excluding template rendering', ['endpoint'])
+template_duration = metrics.histogram('app_template_render_seconds', 'Template render time', ['template'])
+dataset_build_duration = metrics.gauge('app_dataset_build_seconds',
+                                       'Duration of each stage of the last dataset build', ['stage'])
+profiler = None
+if app.config['PROFILE_SLOW_REQUEST_MS'] > 0:
+    profiler = SlowRequestProfiler(app.config['PROFILE_SLOW_REQUEST_MS'] / 1000)
+
+# Data source and its cleaned snapshot
+data_file = os.path.join(base_dir, 'data', 'SEO_Optimized_Consignment_Stores_Sample_Dataset.xlsx')
+snapshot_dir = os.path.join(base_dir, 'data', 'snapshot')
+gazetteer_file = app.config['GAZETTEER_FILE'] or os.path.join(base_dir, 'data', 'gazetteer.csv')
+# (file stamp, content hash, places) of the last gazetteer read
+gazetteer_cache = (None, None, {})
+# Manifest of the built CSS and JS bundles, see load_assets()
+asset_manifest = None
+# Store photo thumbnails, see load_thumbnails()
+default_photo_file = os.path.join(base_dir, 'static', 'images', 'default-store.jpg')
+thumbnails = None
+thumbnails_lock = threading.Lock()
+# Encoded JSON API lists and compressed API responses
+api_documents = DocumentCache(app.config['API_DOCUMENT_CACHE_MAX_BYTES'])
+api_compressor = Compressor(app.config['API_COMPRESS_MIN_BYTES'])
 
 # Define US regions
 regions = {
@@ -78,85 +208,21 @@ def get_state_counts(df):
         return {}
     return df.groupby('state').size().to_dict()
 
-def validate_photo_url(url):
-    """Validate and clean photo URLs."""
-    if pd.isna(url) or not url:
-        return ''
-    
-    url = str(url).strip()
-    url = url.replace(' ', '%20')
-    
-    if url and not url.startswith(('http://', 'https://')):
-        url = 'https://' + url
-    
-    return url
-
-def format_description(description):
-    """Format store description into paragraphs."""
-    if pd.isna(description) or not description:
-        return ''
-    
-    description = str(description).strip()
-    paragraphs = [p.strip() for p in description.split('\n\n')]
-    return '\n\n'.join(p for p in paragraphs if p)
-
 def format_meta_description(city_name, state_name, store_count):
     """Format meta description for city pages."""
     return (f"Discover {store_count} consignment stores in {city_name}, {state_name}. "
             "Find local thrift stores, consignment shops, and second-hand boutiques.")
 
-@cache.cached(timeout=3600, key_prefix='load_data')
 def load_data():
-    """Load store data from Excel file."""
+    """Load cleaned store data from the snapshot, rebuilding it from Excel if stale."""
+    import pandas as pd
+    from ingest import load_snapshot
     try:
-        file_path = os.path.join(base_dir, 'data', 'SEO_Optimized_Consignment_Stores_Sample_Dataset.xlsx')
-        
-        if not os.path.exists(file_path):
-            app.logger.error(f"Data file not found: {file_path}")
+        if not os.path.exists(data_file) and read_snapshot_meta(snapshot_dir) is None:
+            app.logger.error(f"Data file not found: {data_file}")
             return pd.DataFrame()
             
-        df = pd.read_excel(file_path)
-        
-        # Verify required columns
-        required_columns = [
-            'Business Name', 'Address', 'City', 'State', 
-            'Number of Reviews', 'New SEO Description V2', 
-            'Site', 'Phone', 'Photo'
-        ]
-        
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            app.logger.error(f"Missing required columns: {missing_columns}")
-            return pd.DataFrame()
-        
-        # Rename columns for consistency
-        df = df.rename(columns={
-            'Business Name': 'name',
-            'Address': 'address',
-            'City': 'city',
-            'State': 'state',
-            'Number of Reviews': 'review_count',
-            'New SEO Description V2': 'description',
-            'Site': 'website',
-            'Phone': 'phone',
-            'Photo': 'photo'
-        })
-        
-        # Convert review count to numeric, replacing NaN with 0
-        df['review_count'] = pd.to_numeric(df['review_count'], errors='coerce').fillna(0).astype(int)
-        
-        # Clean string columns
-        string_columns = ['name', 'address', 'city', 'state', 'website', 'phone']
-        for col in string_columns:
-            df[col] = df[col].fillna('').astype(str).str.strip()
-        
-        # Process descriptions and photos
-        df['description'] = df['description'].apply(format_description)
-        df['photo'] = df['photo'].apply(validate_photo_url)
-        
-        # Add hours column if it doesn't exist
-        if 'hours' not in df.columns:
-            df['hours'] = 'Hours not available'
+        df = load_snapshot(data_file, snapshot_dir)
         
         app.logger.info(f"Loaded {len(df)} records from dataset")
         app.logger.info(f"Found {df['photo'].notna().sum()} stores with photos")
@@ -166,59 +232,254 @@ def load_data():
         app.logger.error(f"Error loading data: {str(e)}")
         return pd.DataFrame()
 
-def process_data(df):
-    """Process DataFrame into structured format."""
+def load_store_table():
+    """Memory-map the shared store table, rebuilding the snapshot first if stale."""
+    from ingest import refresh_snapshot
+    try:
+        from store_table import StoreTable
+    except ImportError:
+        StoreTable = None
+    try:
+        if StoreTable is None or SNAPSHOT_FORMAT != 'arrow':
+            app.logger.warning("Shared store table requires pyarrow, falling back to per-worker data")
+            return None
+        
+        if not os.path.exists(data_file) and read_snapshot_meta(snapshot_dir) is None:
+            app.logger.error(f"Data file not found: {data_file}")
+            return None
+        
+        refresh_snapshot(data_file, snapshot_dir)
+        table = StoreTable(snapshot_paths(snapshot_dir)[0])
+        
+        app.logger.info(f"Attached shared store table with {len(table)} records")
+        return table
+        
+    except Exception as e:
+        app.logger.error(f"Error attaching shared store table: {str(e)}")
+        return None
+
+def get_dataset_version(gazetteer_version=None):
+    """Return ``(version, last_modified)`` identifying the loaded dataset.
+    
+    A ``gazetteer_version`` is folded in, since the gazetteer decides the
+    nearby cities shown on every city page.
+    """
+    meta = read_snapshot_meta(snapshot_dir)
+    if meta is None:
+        return 'empty', None
+    version = f"{meta['snapshot_version']}-{meta['source_sha256'][:16]}"
+    if gazetteer_version:
+        version = f"{version}-{gazetteer_version}"
+    last_modified = datetime.utcfromtimestamp(meta['source_mtime_ns'] / 1e9)
+    return version, last_modified
+
+def create_page_cache():
+    """Create the rendered page cache for the configured backend."""
+    if app.config['PAGE_CACHE_BACKEND'] == 'flask':
+        store = FlaskCachePageStore(cache)
+    else:
+        store = LRUPageStore(max_bytes=app.config['PAGE_CACHE_MAX_BYTES'])
+    
+    return PageCache(store, max_age=app.config['PAGE_CACHE_MAX_AGE'], get_version=current_dataset_version)
+
+def create_sitemap_builder(df, processed_data, store_table=None):
+    """Build the sitemap URL list with per-city lastmod dates for this dataset."""
+    from sitemaps import SitemapBuilder, load_city_lastmod
+    version, last_modified = get_dataset_version()
+    changed_at = last_modified or datetime.now()
+    
+    def fingerprint_source():
+        if store_table is not None:
+            return store_table.frame(list(STORE_FIELDS) + ['state', 'city'])
+        return df
+    
+    try:
+        city_lastmod = load_city_lastmod(os.path.join(snapshot_dir, 'lastmod.json'),
+                                         version, changed_at, fingerprint_source)
+    except Exception as e:
+        app.logger.error(f"Error loading sitemap lastmod dates: {str(e)}")
+        city_lastmod = {}
+    
+    return SitemapBuilder(processed_data, city_lastmod, changed_at.strftime('%Y-%m-%d'))
+
+def assign_unique_slugs(cities):
+    """Suffix duplicate city slugs within a state so every city is routable.
+
+    Cities sharing a slug are suffixed in order of their raw name, not their
+    display order, so a city's URL doesn't change when store counts do.
+    Returns the cities that were given a suffixed slug.
+    """
+    by_slug = {}
+    for city in cities:
+        by_slug.setdefault(city.slug, []).append(city)
+    
+    taken = set(by_slug)
+    renamed = []
+    for base_slug, group in by_slug.items():
+        if len(group) < 2:
+            continue
+        group.sort(key=lambda city: city.name)
+        suffix = 1
+        for city in group[1:]:
+            suffix += 1
+            while f"{base_slug}-{suffix}" in taken:
+                suffix += 1
+            city.slug = f"{base_slug}-{suffix}"
+            taken.add(city.slug)
+            renamed.append(city)
+    return renamed
+
+def log_renamed_cities(renamed):
+    """Log one warning for the ``(state, city)`` pairs given suffixed slugs in a build."""
+    if renamed:
+        app.logger.warning(f"Duplicate city slugs, suffixed {len(renamed)} cities: " +
+                           ", ".join(f"{state_name}/{city.name} -> {city.slug}" for state_name, city in renamed))
+
+def load_places():
+    """Return ``(version, places)`` for the gazetteer, re-reading it only when the file changes.
+    
+    ``version`` is a hash of the file's contents, or None without a usable
+    gazetteer. The reloader watches the file, so a changed gazetteer
+    triggers a rebuild.
+    """
+    from geo import load_gazetteer
+    global gazetteer_cache
+    stamp = file_stamp(gazetteer_file)
+    if stamp != gazetteer_cache[0]:
+        try:
+            places = load_gazetteer(gazetteer_file)
+            version = None
+            if places:
+                with open(gazetteer_file, 'rb') as f:
+                    version = hashlib.sha256(f.read()).hexdigest()[:8]
+        except Exception as e:
+            app.logger.error(f"Error loading gazetteer {gazetteer_file}: {str(e)}")
+            version, places = None, {}
+        gazetteer_cache = (stamp, version, places)
+    return gazetteer_cache[1:]
+
+def build_route_index(processed_data, nearby_limit=6, geo_index=None):
+    """Build slug lookup tables for the state and city routes.
+
+    Returns ``(state_index, city_index)`` where ``state_index`` maps
+    ``state_slug -> state_data`` and ``city_index`` maps
+    ``(state_slug, city_slug) -> {'state', 'city', 'nearby_cities'}``.
+    Nearby cities are the closest in the same state when ``geo_index`` has
+    locations for them, topped up with the largest cities in the state.
+    """
+    state_index = {}
+    city_index = {}
+    
+    for state_data in processed_data.values():
+        state_slug = state_data.slug
+        if state_slug in state_index:
+            app.logger.warning(f"Duplicate state slug '{state_slug}' for {state_data.name}")
+            continue
+        state_index[state_slug] = state_data
+        
+        cities = state_data.cities
+        closest = geo_index.neighbours(state_data.name, nearby_limit) if geo_index else {}
+        for city in cities:
+            nearby_cities = list(closest.get(city.name, ()))
+            for other in cities:
+                if len(nearby_cities) >= nearby_limit:
+                    break
+                if other is not city and other not in nearby_cities:
+                    nearby_cities.append(other)
+            
+            city_index[(state_slug, city.slug)] = {
+                'state': state_data,
+                'city': city,
+                'nearby_cities': nearby_cities
+            }
+    
+    return state_index, city_index
+
+def build_city(city_name, city_group, store_table=None):
+    """Build one City record from its rows, stores ordered by review count."""
+    # Sort stores by review count
+    stores = city_group.sort_values('review_count', ascending=False)
+    
+    if store_table is not None:
+        store_records = store_table.rows(stores.index)
+    else:
+        store_records = [
+            Store(*row)
+            for row in stores[list(STORE_FIELDS)].itertuples(index=False, name=None)
+        ]
+    
+    return City(
+        name=city_name,
+        slug=safe_slugify(city_name),
+        store_count=len(stores),
+        total_reviews=int(stores['review_count'].sum()),
+        stores=store_records
+    )
+
+def build_state(state_name, cities, renamed=None):
+    """Build a State record from its cities, or None if it has none.
+    
+    Cities given a suffixed slug are appended to ``renamed`` as
+    ``(state_name, city)`` pairs, so the caller can log them once.
+    """
+    if not cities:
+        return None
+    
+    # Sort cities by store count and total reviews
+    cities.sort(key=lambda x: (x.store_count, x.total_reviews), reverse=True)
+    
+    # Give cities that share a slug (e.g. "St. Louis" / "St Louis") unique slugs
+    for city in assign_unique_slugs(cities):
+        if renamed is not None:
+            renamed.append((state_name, city))
+    
+    return State(
+        name=state_name,
+        slug=safe_slugify(state_name),
+        store_count=sum(city.store_count for city in cities),
+        city_count=len(cities),
+        total_reviews=sum(city.total_reviews for city in cities),
+        cities=cities
+    )
+
+def group_cities(df, store_table=None):
+    """Group rows into ``{state_name: [City, ...]}``, skipping blank names."""
+    import pandas as pd
+    cities_by_state = {}
+    
+    # Group by state and city
+    for state_name, state_group in df.groupby('state'):
+        if not state_name or pd.isna(state_name):
+            continue
+        
+        cities = cities_by_state[state_name] = []
+        for city_name, city_group in state_group.groupby('city'):
+            if not city_name or pd.isna(city_name):
+                continue
+            cities.append(build_city(city_name, city_group, store_table))
+    
+    return cities_by_state
+
+def process_data(df, store_table=None):
+    """Process DataFrame into structured format.
+    
+    States, cities and stores are built as compact ``records`` objects. With
+    a ``store_table``, ``df`` only needs the grouping columns and each city's
+    stores are views into the shared table instead of Store records.
+    """
     try:
         if df.empty:
             app.logger.error("Empty DataFrame received for processing")
             return {}
             
         processed_data = {}
+        renamed = []
+        for state_name, cities in group_cities(df, store_table).items():
+            state_data = build_state(state_name, cities, renamed)
+            if state_data is not None:
+                processed_data[state_name] = state_data
         
-        # Group by state and city
-        state_groups = df.groupby('state')
-        
-        for state_name, state_group in state_groups:
-            if not state_name or pd.isna(state_name):
-                continue
-                
-            state_slug = safe_slugify(state_name)
-            city_groups = state_group.groupby('city')
-            
-            cities = []
-            total_state_reviews = 0
-            
-            for city_name, city_group in city_groups:
-                if not city_name or pd.isna(city_name):
-                    continue
-                    
-                # Sort stores by review count
-                stores = city_group.sort_values('review_count', ascending=False)
-                
-                city_data = {
-                    'name': city_name,
-                    'slug': safe_slugify(city_name),
-                    'store_count': len(stores),
-                    'total_reviews': int(stores['review_count'].sum()),
-                    'stores': stores.to_dict('records')
-                }
-                
-                cities.append(city_data)
-                total_state_reviews += city_data['total_reviews']
-            
-            if cities:
-                # Sort cities by store count and total reviews
-                cities.sort(key=lambda x: (x['store_count'], x['total_reviews']), reverse=True)
-                
-                processed_data[state_name] = {
-                    'name': state_name,
-                    'slug': state_slug,
-                    'store_count': sum(city['store_count'] for city in cities),
-                    'city_count': len(cities),
-                    'total_reviews': total_state_reviews,
-                    'cities': cities
-                }
-        
+        log_renamed_cities(renamed)
         app.logger.info(f"Processed {len(processed_data)} states")
         return processed_data
         
@@ -226,33 +487,274 @@ def process_data(df):
         app.logger.error(f"Error processing data: {str(e)}")
         return {}
 
-# Load and process data at startup
-df = load_data()
-processed_data = process_data(df)
+def update_processed_data(previous, df, affected_cities):
+    """Incrementally rebuild ``previous`` for a new DataFrame.
+    
+    Only cities in ``affected_cities`` (``(state, city)`` pairs) are regrouped
+    from ``df``; states containing them are re-aggregated with copies of
+    their other cities, and every other state is reused as-is. The result
+    equals ``process_data(df)``.
+    """
+    import pandas as pd
+    affected_states = {state_name for state_name, _ in affected_cities}
+    
+    pairs = pd.MultiIndex.from_frame(df[['state', 'city']])
+    changed_rows = df[pairs.isin(list(affected_cities))]
+    rebuilt = group_cities(changed_rows)
+    
+    processed_data = {}
+    renamed = []
+    state_names = set(previous) | affected_states
+    for state_name in sorted(state_names):
+        if state_name not in affected_states:
+            processed_data[state_name] = previous[state_name]
+            continue
+        
+        # Copies, since assigning slugs must not touch the live records
+        cities = [
+            City(city.name, safe_slugify(city.name), city.store_count, city.total_reviews, city.stores)
+            for city in (previous[state_name].cities if state_name in previous else [])
+            if (state_name, city.name) not in affected_cities
+        ]
+        cities.extend(rebuilt.get(state_name, []))
+        # groupby() yields cities by name; match it so ties sort identically
+        cities.sort(key=lambda city: city.name)
+        
+        state_data = build_state(state_name, cities, renamed)
+        if state_data is not None:
+            processed_data[state_name] = state_data
+    
+    log_renamed_cities(renamed)
+    app.logger.info(f"Incrementally rebuilt {len(affected_cities)} cities in {len(affected_states)} states")
+    return processed_data
+
+def diff_dataset(previous, df):
+    """Diff ``df`` against the previous dataset, or None if a full rebuild is needed."""
+    from incremental import diff_stores, MAX_INCREMENTAL_FRACTION
+    if previous.store_table is not None or previous.df.empty or df.empty:
+        return None
+    
+    try:
+        diff = diff_stores(previous.df, df)
+    except Exception as e:
+        app.logger.error(f"Error diffing datasets, rebuilding fully: {str(e)}")
+        return None
+    
+    app.logger.info(f"Dataset diff: {diff.added} added, {diff.removed} removed, "
+                    f"{diff.changed} changed in {len(diff.affected_cities)} cities")
+    if diff.changed_fraction > MAX_INCREMENTAL_FRACTION:
+        return None
+    return diff
+
+def build_dataset(previous=None):
+    """Load the data and build every structure the routes read from it.
+    
+    With a ``previous`` dataset, small changes are applied incrementally:
+    only changed cities are regrouped and only their states re-indexed.
+    """
+    from ingest import stage_timer
+    from incremental import ChangeSet
+    from geo import GeoIndex
+    timings = {}
+    with stage_timer(timings, 'load'):
+        store_table = load_store_table() if app.config['SHARED_STORE_TABLE'] else None
+        if store_table is not None:
+            df = store_table.frame(['state', 'city', 'review_count'])
+        else:
+            df = load_data()
+    
+    with stage_timer(timings, 'diff'):
+        diff = diff_dataset(previous, df) if previous is not None and store_table is None else None
+    if diff is not None:
+        with stage_timer(timings, 'process'):
+            processed_data = previous.processed_data
+            if diff.affected_cities:
+                processed_data = update_processed_data(processed_data, df, diff.affected_cities)
+        with stage_timer(timings, 'search_index'):
+            search_index = previous.search_index.update(processed_data, diff.affected_states)
+    else:
+        with stage_timer(timings, 'process'):
+            processed_data = process_data(df, store_table)
+        with stage_timer(timings, 'search_index'):
+            search_index = SearchIndex(processed_data)
+    
+    with stage_timer(timings, 'geo_index'):
+        gazetteer_version, places = load_places()
+        geo_index = GeoIndex.build(processed_data, places)
+    with stage_timer(timings, 'route_index'):
+        state_index, city_index = build_route_index(processed_data, geo_index=geo_index)
+    with stage_timer(timings, 'summary'):
+        summary = DatasetSummary(processed_data, regions)
+    with stage_timer(timings, 'sitemap'):
+        sitemap_builder = create_sitemap_builder(df, processed_data, store_table)
+    version, last_modified = get_dataset_version(gazetteer_version)
+    
+    for stage, seconds in timings.items():
+        dataset_build_duration.set(stage, value=seconds)
+    app.logger.info(f"Built dataset {version}: " +
+                    ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items()))
+    
+    fields = dict(
+        version=version,
+        last_modified=last_modified,
+        df=df,
+        store_table=store_table,
+        processed_data=processed_data,
+        state_index=state_index,
+        city_index=city_index,
+        search_index=search_index,
+        geo_index=geo_index,
+        gazetteer_version=gazetteer_version,
+        sitemap_builder=sitemap_builder,
+        summary=summary,
+        template_context=dict(
+            summary.template_context,
+            regions=regions,
+            location_search=len(geo_index) > 0,
+            processed_data=processed_data,
+            safe_slugify=safe_slugify
+        )
+    )
+    if previous is None:
+        return Dataset(**fields)
+    
+    changes = ChangeSet.between(previous, Dataset(**fields), diff)
+    return Dataset(changes=changes, **fields)
+
+def reload_dataset():
+    """Build a replacement dataset, refusing to replace real data with nothing."""
+    previous = dataset
+    new_dataset = build_dataset(previous=previous)
+    if previous is not None and not new_dataset.processed_data and previous.processed_data:
+        raise ValueError("Reloaded dataset is empty")
+    return new_dataset
+
+def swap_dataset(new_dataset):
+    """Make ``new_dataset`` active; requests already running keep their own."""
+    global dataset
+    dataset = new_dataset
+    
+    changes = new_dataset.changes
+    keep = None
+    if changes is not None and not changes.global_changed:
+        keep = lambda path: not changes.invalidates(path)
+    page_cache.set_version(new_dataset.version, new_dataset.last_modified, keep=keep)
+    error_pages.set_version(new_dataset.version)
+    app.logger.info(f"Serving dataset {new_dataset.version}")
+    
+    if changes is not None:
+        try:
+            changes.write(os.path.join(snapshot_dir, 'changes.json'))
+        except Exception as e:
+            app.logger.error(f"Error writing change set: {str(e)}")
+
+def load_dataset():
+    """Return the active dataset, building it on first use."""
+    if dataset is None:
+        with dataset_lock:
+            if dataset is None:
+                reloader.load()
+    return dataset
+
+def current_dataset():
+    """Return the dataset pinned to the current request, or the active one."""
+    if has_request_context():
+        if 'dataset' not in g:
+            g.dataset = load_dataset()
+        return g.dataset
+    return load_dataset()
+
+def current_dataset_version():
+    current = current_dataset()
+    return current.version, current.last_modified
+
+# Built by load_dataset() on first use or by create_app(); later versions are
+# swapped in by the reloader
+dataset = None
+dataset_lock = threading.Lock()
+page_cache = create_page_cache()
+error_pages = ErrorPages('', app.config['NOT_FOUND_CACHE_SIZE'], get_version=current_dataset_version)
+reloader = DatasetReloader(reload_dataset, swap_dataset, data_file, snapshot_paths(snapshot_dir)[1],
+                           interval=app.config['DATA_RELOAD_INTERVAL'], watch_paths=(gazetteer_file,))
+
+@app.before_first_request
+def start_reloader():
+    """Start watching the data file in this worker process."""
+    reloader.start()
+    if profiler is not None:
+        profiler.start()
+
+@app.before_request
+def start_request_timer():
+    """Record when the request started, for the latency metrics."""
+    g.request_start = time.perf_counter()
+    g.render_seconds = 0.0
+    if profiler is not None:
+        profiler.begin(f"{request.method} {request.full_path}")
+
+@app.after_request
+def record_request_metrics(response):
+    """Record request latency, split into handler and template time."""
+    start = g.get('request_start')
+    if start is not None:
+        elapsed = time.perf_counter() - start
+        endpoint = request.endpoint or 'unmatched'
+        request_count.inc(endpoint, request.method, response.status_code)
+        request_duration.observe(elapsed, endpoint, request.method)
+        handler_duration.observe(max(elapsed - g.render_seconds, 0.0), endpoint)
+    if profiler is not None:
+        profiler.end()
+    return response
+
+def _template_started(sender, template, context, **extra):
+    g.template_start = time.perf_counter()
+
+def _template_finished(sender, template, context, **extra):
+    start = g.pop('template_start', None)
+    if start is not None:
+        seconds = time.perf_counter() - start
+        g.render_seconds = g.get('render_seconds', 0.0) + seconds
+        template_duration.observe(seconds, template.name)
+
+# Template timing needs blinker for Flask's signals
+if signals_available:
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+
+@app.after_request
+def add_dataset_version(response):
+    """Expose the dataset version that served the request."""
+    response.headers['X-Dataset-Version'] = current_dataset().version
+    return response
 
 @app.context_processor
 def utility_processor():
     """Add utility functions and global variables to template context."""
-    state_counts = {
-        state: data['store_count'] 
-        for state, data in processed_data.items()
-    }
+    return current_dataset().template_context
+
+def not_found_page(remember=True):
+    """Return the 404 page and remember the path in the negative cache.
     
-    return {
-        'total_stores': sum(state['store_count'] for state in processed_data.values()),
-        'total_cities': sum(state['city_count'] for state in processed_data.values()),
-        'total_states': len(processed_data),
-        'regions': regions,
-        'processed_data': processed_data,
-        'current_date': datetime.now(),
-        'safe_slugify': safe_slugify,
-        'state_counts': state_counts,
-        'popular_states': sorted(
-            processed_data.keys(),
-            key=lambda x: processed_data[x]['store_count'],
-            reverse=True
-        )[:5]
-    }
+    Pass ``remember=False`` when only the query string is invalid, since the
+    negative cache is keyed by path alone.
+    """
+    if remember:
+        error_pages.remember_missing(request.path)
+    return error_pages.response('404.html', 404, lambda: render_template('404.html'))
+
+def error_page():
+    """Return the error page, falling back to plain text if it cannot render."""
+    try:
+        return error_pages.response('error.html', 500, lambda: render_template('error.html'))
+    except Exception as e:
+        app.logger.error(f"Error rendering error page: {str(e)}")
+        return make_response("Internal Server Error", 500)
+
+@app.before_request
+def answer_known_missing():
+    """Answer repeated requests for missing pages without routing or logging them."""
+    if error_pages.is_missing(request.path):
+        return error_pages.response('404.html', 404, lambda: render_template('404.html'))
 
 # Custom template filters
 @app.template_filter('safe_slugify')
@@ -265,6 +767,14 @@ def tojson_filter(obj):
     """Convert object to JSON string."""
     return json.dumps(obj)
 
+@app.template_filter('excerpt')
+def excerpt_filter(text, length=200):
+    """Shorten text to its first paragraph, cut at a word boundary."""
+    text = safe_str(text).split('\n\n', 1)[0].strip()
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0].rstrip(',.;:') + '\u2026'
+
 @app.template_filter('avg')
 def avg_filter(values):
     """Calculate average of values."""
@@ -273,116 +783,251 @@ def avg_filter(values):
     except (TypeError, ZeroDivisionError):
         return 0
 
+def load_assets():
+    """Return the asset manifest, building stale bundles first.
+    
+    Sources are checked once per process, or on every render in debug mode
+    so stylesheet edits show up on reload.
+    """
+    global asset_manifest
+    if asset_manifest is None or app.debug:
+        try:
+            asset_manifest = build_assets(app.static_folder)
+        except Exception as e:
+            app.logger.error(f"Error building assets: {str(e)}")
+            asset_manifest = load_manifest(app.static_folder) or {'files': {}}
+    return asset_manifest
+
+@app.template_global()
+def asset_url(name):
+    """URL of a built bundle, e.g. ``asset_url('site.css')``."""
+    path = load_assets()['files'].get(name)
+    if path is None:
+        app.logger.error(f"Unknown asset bundle: {name}")
+        path = f'{BUILD_DIR}/{name}'
+    return url_for('static', filename=path)
+
+def static_file(filename):
+    """Serve a static file; built bundles are immutable and sent pre-compressed."""
+    if not filename.startswith(f'{BUILD_DIR}/') or filename.endswith(MANIFEST_NAME):
+        return send_from_directory(app.static_folder, filename)
+    
+    encoding, variant = compressed_variant(app.static_folder, filename, request.accept_encodings)
+    response = send_from_directory(app.static_folder, variant, mimetype=mimetypes.guess_type(filename)[0],
+                                   download_name=os.path.basename(filename), max_age=365 * 24 * 3600)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+app.view_functions['static'] = static_file
+
+def load_thumbnails():
+    """Return the thumbnail service, or None when the image proxy is off."""
+    global thumbnails
+    if not app.config['IMAGE_PROXY']:
+        return None
+    if thumbnails is None:
+        with thumbnails_lock:
+            if thumbnails is None:
+                if not webp_supported():
+                    app.logger.warning("Image proxy needs Pillow with WebP support, linking original photos")
+                    app.config['IMAGE_PROXY'] = False
+                    return None
+                if app.config['IMAGE_SOURCE_DIR']:
+                    source = DirectorySource(app.config['IMAGE_SOURCE_DIR'])
+                else:
+                    source = HTTPSource(timeout=app.config['IMAGE_FETCH_TIMEOUT'])
+                cache_dir = app.config['IMAGE_CACHE_DIR'] or os.path.join(base_dir, 'data', 'images')
+                thumbnails = ThumbnailService(ThumbnailCache(cache_dir, app.config['IMAGE_CACHE_MAX_BYTES']),
+                                              source, workers=app.config['IMAGE_WORKERS'],
+                                              failure_ttl=app.config['IMAGE_FAILURE_TTL'])
+    return thumbnails
+
+@app.template_global()
+def photo_url(url, size='card'):
+    """URL of a store photo's thumbnail, or the photo itself without the image proxy."""
+    service = load_thumbnails()
+    if service is None or not url:
+        return url
+    return url_for('image', key=service.key(url, size))
+
+@app.template_global()
+def photo_srcset(url):
+    """``srcset`` listing every thumbnail width of a photo, or '' without the image proxy."""
+    if load_thumbnails() is None or not url:
+        return ''
+    return ', '.join(f"{photo_url(url, size)} {width}w" for size, (width, _) in PHOTO_SIZES.items())
+
+def default_photo(size):
+    """Path of the default store image as a thumbnail of ``size``."""
+    cache = load_thumbnails().cache
+    key = image_key(default_photo_file, size)
+    path = cache.get(key)
+    if path is None:
+        with open(default_photo_file, 'rb') as f:
+            path = cache.put(key, make_thumbnail(f.read(), PHOTO_SIZES[size]))
+    return path
+
+def paginate(items, page, size):
+    """Return one page of ``items`` and its position, or None if ``page`` is out of range.
+    
+    A ``size`` of 0 puts every item on one page.
+    """
+    total = len(items)
+    if size <= 0:
+        size = max(total, 1)
+    pages = max(1, (total + size - 1) // size)
+    if page < 1 or page > pages:
+        return None
+    offset = (page - 1) * size
+    return {
+        'items': items[offset:offset + size],
+        'page': page,
+        'pages': pages,
+        'size': size,
+        'total': total,
+        'offset': offset
+    }
+
+def city_page_args():
+    """Return the requested ``(page, size)`` and the ``size`` to repeat in page links."""
+    page = request.args.get('page', 1, type=int)
+    size_param = request.args.get('size', type=int)
+    if size_param is None:
+        return page, app.config['CITY_PAGE_SIZE'], None
+    size_param = max(1, min(size_param, MAX_PER_PAGE))
+    return page, size_param, size_param
+
+def lookup_city(state_name, city_name):
+    """Return the city index entry for a request, logging why if there is none."""
+    data = current_dataset()
+    entry = data.city_index.get((state_name, city_name))
+    if not entry:
+        if state_name not in data.state_index:
+            app.logger.warning(f"State not found: {state_name}")
+        else:
+            app.logger.warning(f"City not found: {city_name} in state {state_name}")
+    return entry
+
 # Routes
 @app.route('/')
+@page_cache.cached
 def home():
     """Home page route."""
     try:
-        # Get the 6 most popular cities based on store count
-        popular_cities = []
-        for state_data in processed_data.values():
-            for city in state_data['cities']:
-                city_info = {
-                    'name': city['name'],
-                    'state': state_data['name'],
-                    'state_slug': state_data['slug'],
-                    'slug': safe_slugify(city['name']),
-                    'store_count': city['store_count'],
-                    'total_reviews': city['total_reviews']
-                }
-                popular_cities.append(city_info)
-        
-        popular_cities.sort(key=lambda x: (x['store_count'], x['total_reviews']), reverse=True)
-        popular_cities = popular_cities[:6]
-        
+        summary = current_dataset().summary
         return render_template(
             'home.html',
-            popular_cities=popular_cities,
+            popular_cities=summary.popular_cities,
             title="Find Local Consignment Stores | Thrift Store Directory",
             meta_description="Discover local consignment stores, thrift shops, and second-hand boutiques. "
-                           f"Browse our directory of {sum(state['store_count'] for state in processed_data.values())} "
-                           f"stores across {len(processed_data)} states."
+                           f"Browse our directory of {summary.total_stores} "
+                           f"stores across {summary.total_states} states."
         )
     except Exception as e:
         app.logger.error(f"Error in home route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
 
 @app.route('/state/<state_name>')
+@page_cache.cached
 def state(state_name):
     """State page route."""
     try:
-        # Find state data
-        state_data = next(
-            (data for state, data in processed_data.items() 
-             if safe_slugify(state) == state_name),
-            None
-        )
+        state_data = current_dataset().state_index.get(state_name)
         
         if not state_data:
             app.logger.warning(f"State not found: {state_name}")
-            return render_template('404.html'), 404
+            return not_found_page()
         
         return render_template(
             'state.html',
             state=state_data,
-            cities=state_data['cities'],
+            cities=state_data.cities,
             state_name=state_name,
-            title=f"Consignment Stores in {state_data['name']} | Thrift Store Directory",
-            meta_description=f"Find consignment stores in {state_data['name']}. Browse our directory "
-                           f"of {state_data['store_count']} stores across {state_data['city_count']} cities."
+            title=f"Consignment Stores in {state_data.name} | Thrift Store Directory",
+            meta_description=f"Find consignment stores in {state_data.name}. Browse our directory "
+                           f"of {state_data.store_count} stores across {state_data.city_count} cities."
         )
     except Exception as e:
         app.logger.error(f"Error in state route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
 
 @app.route('/state/<state_name>/<city_name>')
+@page_cache.cached
 def city(state_name, city_name):
     """City page route."""
     try:
-        # Find state data
-        state_data = next(
-            (data for state, data in processed_data.items() 
-             if safe_slugify(state) == state_name),
-            None
-        )
+        entry = lookup_city(state_name, city_name)
+        if not entry:
+            return not_found_page()
         
-        if not state_data:
-            app.logger.warning(f"State not found: {state_name}")
-            return render_template('404.html'), 404
-            
-        # Find city data
-        city_data = next(
-            (city for city in state_data['cities'] 
-             if safe_slugify(city['name']) == city_name),
-            None
-        )
+        state_data = entry['state']
+        city_data = entry['city']
+        nearby_cities = entry['nearby_cities']
         
-        if not city_data:
-            app.logger.warning(f"City not found: {city_name} in state {state_name}")
-            return render_template('404.html'), 404
+        page, size, size_param = city_page_args()
+        pagination = paginate(city_data.stores, page, size)
+        if pagination is None:
+            return not_found_page(remember=False)
         
-        # Get nearby cities (up to 6)
-        nearby_cities = [
-            city for city in state_data['cities']
-            if safe_slugify(city['name']) != city_name
-        ][:6]
+        title = f"Consignment Stores in {city_data.name}, {state_data.name}"
+        if page > 1:
+            title += f" - Page {page}"
         
         return render_template(
             'city.html',
             state=state_data,
             city=city_data,
-            stores=city_data['stores'],
+            stores=pagination['items'],
+            offset=pagination['offset'],
+            pagination=pagination,
+            size_param=size_param,
             nearby_cities=nearby_cities,
-            title=f"Consignment Stores in {city_data['name']}, {state_data['name']}",
+            title=title,
             meta_description=format_meta_description(
-                city_data['name'],
-                state_data['name'],
-                city_data['store_count']
+                city_data.name,
+                state_data.name,
+                city_data.store_count
             )
         )
     except Exception as e:
         app.logger.error(f"Error in city route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
+
+@app.route('/state/<state_name>/<city_name>/stores')
+@page_cache.cached
+def city_stores(state_name, city_name):
+    """One page of a city's store cards as an HTML fragment, for infinite scroll."""
+    try:
+        entry = lookup_city(state_name, city_name)
+        if not entry:
+            return jsonify({'error': 'City not found'}), 404
+        
+        page, size, size_param = city_page_args()
+        pagination = paginate(entry['city'].stores, page, size)
+        if pagination is None:
+            return jsonify({'error': 'Page out of range'}), 404
+        
+        next_url = None
+        if page < pagination['pages']:
+            next_url = url_for('city_stores', state_name=state_name, city_name=city_name,
+                               page=page + 1, size=size_param)
+        
+        return jsonify({
+            'page': page,
+            'pages': pagination['pages'],
+            'size': pagination['size'],
+            'total': pagination['total'],
+            'next': next_url,
+            'html': render_template('store_cards.html', stores=pagination['items'],
+                                    offset=pagination['offset'])
+        })
+    except Exception as e:
+        app.logger.error(f"Error in city stores route: {str(e)}")
+        return jsonify({'error': 'Stores unavailable'}), 500
 
 @app.route('/about')
 def about():
@@ -396,7 +1041,7 @@ def about():
         )
     except Exception as e:
         app.logger.error(f"Error in about route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
 
 @app.route('/search')
 def search():
@@ -406,8 +1051,8 @@ def search():
         
         if not query:
             popular_states = sorted(
-                [{'name': k, 'slug': v['slug'], 'store_count': v['store_count']}
-                 for k, v in processed_data.items()],
+                [{'name': k, 'slug': v.slug, 'store_count': v.store_count}
+                 for k, v in current_dataset().processed_data.items()],
                 key=lambda x: x['store_count'],
                 reverse=True
             )[:12]
@@ -424,60 +1069,238 @@ def search():
                                "and second-hand boutiques in your area."
             )
         
-        # Search states, cities, and stores
-        states = []
-        cities = []
-        stores = []
-        
-        for state_name, state_data in processed_data.items():
-            # State matches
-            if query in state_name.lower():
-                states.append({
-                    'name': state_name,
-                    'slug': state_data['slug'],
-                    'store_count': state_data['store_count'],
-                    'city_count': state_data['city_count']
-                })
-            
-            # City matches
-            for city in state_data['cities']:
-                if query in city['name'].lower():
-                    cities.append({
-                        'name': city['name'],
-                        'state_name': state_name,
-                        'state_slug': state_data['slug'],
-                        'slug': safe_slugify(city['name']),
-                        'store_count': city['store_count'],
-                        'total_reviews': city['total_reviews']
-                    })
-                
-                # Store matches
-                for store in city['stores']:
-                    if query in store['name'].lower():
-                        store_info = store.copy()
-                        store_info.update({
-                            'city': city['name'],
-                            'state': state_name,
-                            'city_slug': safe_slugify(city['name']),
-                            'state_slug': state_data['slug']
-                        })
-                        stores.append(store_info)
+        page = request.args.get('page', 1, type=int)
+        per_page_param = request.args.get('per_page', type=int)
+        per_page = DEFAULT_PER_PAGE if per_page_param is None else per_page_param
+        results = current_dataset().search_index.search(query, page=page, per_page=per_page)
         
         return render_template(
             'search.html',
             query=query,
-            states=states,
-            cities=cities,
-            stores=stores,
+            # Repeated in page links only when requested, like the city pages' size
+            per_page_param=results['per_page'] if per_page_param is not None else None,
+            states=results['states'],
+            cities=results['cities'],
+            stores=results['stores'],
+            results=results,
             title=f"Search Results for '{query}' | Consignment Store Directory",
             meta_description=f"Search results for '{query}'. Find local consignment stores, "
                            "thrift shops, and second-hand boutiques in your area."
         )
     except Exception as e:
         app.logger.error(f"Error in search route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
+
+@app.route('/search/suggest')
+def search_suggest():
+    """Typeahead search suggestions as JSON."""
+    try:
+        query = request.args.get('q', '').strip()
+        limit = request.args.get('limit', DEFAULT_SUGGEST_LIMIT, type=int)
+        
+        suggestions = current_dataset().search_index.suggest(query, limit=limit)
+        for suggestion in suggestions:
+            if suggestion['type'] == 'state':
+                suggestion['url'] = url_for('state', state_name=suggestion['state_slug'])
+            else:
+                suggestion['url'] = url_for('city', state_name=suggestion['state_slug'],
+                                            city_name=suggestion['city_slug'])
+        
+        return jsonify({'query': query, 'suggestions': suggestions})
+    except Exception as e:
+        app.logger.error(f"Error in search suggest route: {str(e)}")
+        return jsonify({'query': '', 'suggestions': [], 'error': 'Search unavailable'}), 500
+
+@app.route('/near')
+def near():
+    """Cities and their stores within a radius of a point, nearest first, as JSON."""
+    try:
+        lat = request.args.get('lat', type=float)
+        lon = request.args.get('lon', type=float)
+        radius = request.args.get('radius', app.config['NEAR_RADIUS_KM'], type=float)
+        limit = request.args.get('limit', DEFAULT_PER_PAGE, type=int)
+        if lat is None or lon is None or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+            return jsonify({'error': 'lat and lon must be valid coordinates'}), 400
+        if not radius > 0:
+            return jsonify({'error': 'radius must be a positive number of km'}), 400
+        radius = min(radius, app.config['MAX_NEAR_RADIUS_KM'])
+        limit = max(1, min(limit, MAX_PER_PAGE))
+        
+        geo_index = current_dataset().geo_index
+        if not len(geo_index):
+            return jsonify({'error': 'Location search unavailable'}), 503
+        
+        places, total_cities = geo_index.within(lat, lon, radius, limit)
+        cities = []
+        stores = []
+        for state_data, city, distance in places:
+            url = url_for('city', state_name=state_data.slug, city_name=city.slug)
+            distance = round(distance, 1)
+            if len(cities) < limit:
+                cities.append({
+                    'name': city.name,
+                    'state_name': state_data.name,
+                    'state_slug': state_data.slug,
+                    'slug': city.slug,
+                    'store_count': city.store_count,
+                    'total_reviews': city.total_reviews,
+                    'distance_km': distance,
+                    'url': url
+                })
+            for store in city.stores[:limit - len(stores)]:
+                store_info = store.to_dict()
+                store_info.update({'city': city.name, 'state': state_data.name, 'distance_km': distance,
+                                   'url': url})
+                stores.append(store_info)
+            if len(cities) >= limit and len(stores) >= limit:
+                break
+        
+        return jsonify({
+            'lat': lat,
+            'lon': lon,
+            'radius_km': radius,
+            'total_cities': total_cities,
+            'cities': cities,
+            'stores': stores
+        })
+    except Exception as e:
+        app.logger.error(f"Error in near route: {str(e)}")
+        return jsonify({'error': 'Location search unavailable'}), 500
+
+@app.route('/img/<key>')
+def image(key):
+    """Serve a store photo thumbnail, producing it on first request.
+    
+    Photos that can't be fetched get the default store image, with a short
+    cache lifetime so they are retried once the failure expires. Photos
+    still being fetched get it uncached.
+    """
+    try:
+        service = load_thumbnails()
+        record = service.cache.source(key) if service is not None and is_image_key(key) else None
+        if record is None:
+            return not_found_page(remember=False)
+        
+        path = service.get(key, timeout=app.config['IMAGE_FETCH_TIMEOUT'] + 5)
+        if path is None:
+            response = send_file(default_photo(record[1]), mimetype='image/webp', max_age=3600)
+            if not service.cache.failed(key, service.failure_ttl):
+                # Not done yet rather than failed; the real thumbnail may be ready next request
+                response.cache_control.max_age = None
+                response.cache_control.public = False
+                response.cache_control.no_store = True
+            return response
+        
+        response = send_file(path, mimetype='image/webp', max_age=365 * 24 * 3600)
+        response.cache_control.immutable = True
+        return response
+        
+    except Exception as e:
+        app.logger.error(f"Error serving image {key}: {str(e)}")
+        return error_page()
+
+def api_route(view):
+    """Compress a JSON API view's responses for clients that accept it."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = make_response(view(*args, **kwargs))
+        return api_compressor.compress(response, request.accept_encodings)
+    return wrapper
+
+def api_list(key, kind, items):
+    """Return the encoded list ``key`` of the request's dataset, building it with ``items()``."""
+    return api_documents.get(current_dataset().version, key, lambda: DocumentList(kind, items()))
+
+def api_page(documents, extra=None):
+    """Respond with the page of ``documents`` picked by the cursor, limit and fields arguments."""
+    limit = max(1, min(request.args.get('limit', DEFAULT_PER_PAGE, type=int), MAX_PER_PAGE))
+    fields = parse_fields(documents.kind, request.args.get('fields'))
+    start = documents.resume(request.args.get('cursor'))
+    return Response(documents.page(start, limit, fields, extra), mimetype='application/json')
+
+@app.route('/api/v1/states')
+@api_route
+@page_cache.cached
+def api_states():
+    """All states, by name, as JSON."""
+    try:
+        state_index = current_dataset().state_index
+        documents = api_list('states', 'states',
+                             lambda: [(state_data,) for state_data in state_index.values()])
+        return api_page(documents)
+    except APIError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in API states route: {str(e)}")
+        return jsonify({'error': 'API unavailable'}), 500
+
+@app.route('/api/v1/states/<state_name>/cities')
+@api_route
+@page_cache.cached
+def api_cities(state_name):
+    """A state's cities, largest first, as JSON."""
+    try:
+        state_data = current_dataset().state_index.get(state_name)
+        if not state_data:
+            return jsonify({'error': 'State not found'}), 404
+
+        documents = api_list(f'cities:{state_name}', 'cities',
+                             lambda: [(city, state_data) for city in state_data.cities])
+        return api_page(documents)
+    except APIError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in API cities route: {str(e)}")
+        return jsonify({'error': 'API unavailable'}), 500
+
+@app.route('/api/v1/states/<state_name>/cities/<city_name>/stores')
+@api_route
+@page_cache.cached
+def api_stores(state_name, city_name):
+    """A city's stores, most reviewed first, as JSON."""
+    try:
+        entry = current_dataset().city_index.get((state_name, city_name))
+        if not entry:
+            return jsonify({'error': 'City not found'}), 404
+
+        city_data, state_data = entry['city'], entry['state']
+        documents = api_list(f'stores:{state_name}/{city_name}', 'stores',
+                             lambda: [(store, city_data, state_data) for store in city_data.stores])
+        return api_page(documents)
+    except APIError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in API stores route: {str(e)}")
+        return jsonify({'error': 'API unavailable'}), 500
+
+@app.route('/api/v1/search')
+@api_route
+def api_search():
+    """Ranked state, city or store matches for a query, as JSON."""
+    try:
+        query = request.args.get('q', '').strip()
+        kind = request.args.get('type', 'stores')
+        if kind not in ('states', 'cities', 'stores'):
+            return jsonify({'error': 'type must be one of states, cities, stores'}), 400
+        if not query:
+            return jsonify({'error': 'q is required'}), 400
+
+        matches = current_dataset().search_index.matches(query, kind)
+        if kind == 'states':
+            matches = [(state_data,) for state_data in matches]
+        # Only the requested page is encoded, so search results aren't cached
+        response = api_page(DocumentList(kind, matches, encode=False), {'query': query, 'type': kind})
+        response.headers['Cache-Control'] = f"public, max-age={app.config['PAGE_CACHE_MAX_AGE']}"
+        response.add_etag()
+        return response.make_conditional(request)
+    except APIError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in API search route: {str(e)}")
+        return jsonify({'error': 'API unavailable'}), 500
 
 @app.route('/sitemap')
+@page_cache.cached
 def sitemap():
     """HTML sitemap route."""
     try:
@@ -489,41 +1312,156 @@ def sitemap():
         )
     except Exception as e:
         app.logger.error(f"Error in sitemap route: {str(e)}")
-        return render_template('error.html'), 500
+        return error_page()
 
 @app.route('/sitemap.xml')
+@page_cache.cached
 def sitemap_xml():
-    """XML sitemap route."""
+    """XML sitemap index pointing at the gzip-compressed shards."""
     try:
-        response = make_response(
-            render_template(
-                'sitemap.xml',
-                current_date=datetime.now(),
-                processed_data=processed_data
-            )
+        def shard_url(shard):
+            return url_for('sitemap_shard', shard=shard, _external=True)
+        
+        response = Response(
+            stream_with_context(current_dataset().sitemap_builder.iter_index(shard_url)),
+            mimetype='application/xml'
         )
-        response.headers['Content-Type'] = 'application/xml'
         response.headers['Cache-Control'] = 'public, max-age=86400'
         return response
     except Exception as e:
         app.logger.error(f"Error generating sitemap.xml: {str(e)}")
         return make_response("Error generating sitemap", 500)
 
+@app.route('/sitemaps/sitemap-<int:shard>.xml.gz')
+@page_cache.cached
+def sitemap_shard(shard):
+    """One gzip-compressed sitemap shard of at most 50,000 URLs."""
+    try:
+        sitemap_builder = current_dataset().sitemap_builder
+        if shard >= sitemap_builder.shard_count:
+            return make_response("Sitemap not found", 404)
+        
+        response = make_response(sitemap_builder.shard_gzip(shard, request.url_root))
+        response.headers['Content-Type'] = 'application/gzip'
+        response.headers['Cache-Control'] = 'public, max-age=86400'
+        return response
+    except Exception as e:
+        app.logger.error(f"Error generating sitemap shard {shard}: {str(e)}")
+        return make_response("Error generating sitemap", 500)
+
+def _register_dataset_metrics():
+    def page_cache_entries():
+        return len(page_cache.store) if hasattr(page_cache.store, '__len__') else None
+    
+    def dataset_info():
+        current = current_dataset()
+        return {(current.version,): 1}
+    
+    def snapshot_timings():
+        meta = read_snapshot_meta(snapshot_dir) or {}
+        return {(stage,): seconds for stage, seconds in meta.get('timings', {}).items()}
+    
+    metrics.counter('app_page_cache_requests_total', 'Page cache lookups by result', ['result'],
+                    callback=lambda: {('hit',): page_cache.hits, ('miss',): page_cache.misses})
+    metrics.gauge('app_page_cache_entries', 'Pages held in the page cache', callback=page_cache_entries)
+    metrics.gauge('app_page_cache_bytes', 'Bytes held in the page cache',
+                  callback=lambda: getattr(page_cache.store, 'size', None))
+    metrics.counter('app_not_found_cache_hits_total', 'Repeated 404s answered from the negative cache',
+                    callback=lambda: error_pages.hits)
+    metrics.gauge('app_dataset_info', 'The dataset version being served', ['version'], callback=dataset_info)
+    metrics.gauge('app_dataset_stores', 'Stores in the served dataset',
+                  callback=lambda: current_dataset().summary.total_stores)
+    metrics.gauge('app_dataset_loaded_timestamp_seconds', 'When the served dataset was built',
+                  callback=lambda: current_dataset().loaded_at.timestamp())
+    metrics.counter('app_dataset_reloads_total', 'Dataset reloads by result', ['result'],
+                    callback=lambda: {('success',): reloader.reloads, ('failure',): reloader.failures})
+    metrics.gauge('app_snapshot_build_seconds', 'Duration of each stage of the last snapshot ingest',
+                  ['stage'], callback=snapshot_timings)
+    metrics.gauge('app_process_memory_bytes', 'Worker memory', ['kind'], callback=process_memory)
+    metrics.counter('app_log_records_suppressed_total', 'Log records dropped by the per-call-site rate limit',
+                    callback=lambda: log_handler.rate_limit.suppressed_total if log_handler else 0)
+    metrics.counter('app_log_records_dropped_total', 'Log records dropped because the log queue was full',
+                    callback=lambda: log_handler.dropped if log_handler else 0)
+    metrics.counter('app_image_requests_total', 'Thumbnail requests by result', ['result'],
+                    callback=lambda: {('hit',): thumbnails.hits, ('miss',): thumbnails.misses}
+                    if thumbnails is not None else None)
+    metrics.counter('app_image_failures_total', 'Photos that could not be fetched or decoded',
+                    callback=lambda: thumbnails.failures if thumbnails is not None else None)
+    metrics.gauge('app_image_cache_bytes', 'Bytes of thumbnails and their records in the disk cache',
+                  callback=lambda: thumbnails.cache.size if thumbnails is not None else None)
+    metrics.counter('app_api_document_cache_requests_total', 'JSON API list cache lookups by result', ['result'],
+                    callback=lambda: {('hit',): api_documents.hits, ('miss',): api_documents.misses})
+    metrics.gauge('app_api_document_cache_bytes', 'Bytes of encoded JSON API lists held',
+                  callback=lambda: api_documents.size)
+    if profiler is not None:
+        metrics.counter('app_slow_requests_profiled_total', 'Slow requests sampled by the profiler',
+                        callback=lambda: profiler.profiled)
+
+_register_dataset_metrics()
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics for this worker process."""
+    try:
+        return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        app.logger.error(f"Error rendering metrics: {str(e)}")
+        return make_response("Error rendering metrics", 500)
+
+@app.route('/healthz')
+def healthz():
+    """Report the active dataset version and reload status for monitoring."""
+    data = current_dataset()
+    return jsonify({
+        'status': 'ok' if data.processed_data else 'empty',
+        'dataset_version': data.version,
+        'last_modified': data.last_modified.isoformat() if data.last_modified else None,
+        'loaded_at': data.loaded_at.isoformat(timespec='seconds'),
+        'states': data.summary.total_states,
+        'cities': data.summary.total_cities,
+        'stores': data.summary.total_stores,
+        'reloads': reloader.reloads,
+        'reload_failures': reloader.failures,
+        'last_reload_error': reloader.last_error
+    })
+
 # Error handlers
 @app.errorhandler(404)
 def page_not_found(e):
     """404 error handler."""
     app.logger.warning(f"404 error: {request.url}")
-    return render_template('404.html'), 404
+    if request.path.startswith(f'{API_PREFIX}/'):
+        return jsonify({'error': 'Not found'}), 404
+    return not_found_page()
 
 @app.errorhandler(500)
 def internal_server_error(e):
     """500 error handler."""
     app.logger.error(f"500 error: {str(e)}")
-    return render_template('error.html'), 500
+    return error_page()
+
+def create_app(preload=None):
+    """Prepare the app for serving and return it.
+    
+    Creates the data and log directories, starts logging and rebuilds stale
+    CSS and JS bundles. Unless ``preload`` (default ``PRELOAD_DATA``) is
+    false, the dataset is built now; otherwise the first request that needs
+    it builds it. Importing this module does none of this, so tools that
+    only need helpers stay fast.
+    """
+    for directory in required_dirs:
+        os.makedirs(directory, exist_ok=True)
+    configure_logging()
+    load_assets()
+    load_thumbnails()
+    if app.config['PRELOAD_DATA'] if preload is None else preload:
+        load_dataset()
+    return app
 
 if __name__ == '__main__':
     try:
+        create_app()
+
         print("\nStarting Flask Application...")
         print("============================")
         
@@ -541,12 +1479,12 @@ if __name__ == '__main__':
         else:
             print("✗ Default store image missing")
         
-        # Load initial data
+        # Report the data loaded by create_app()
         print("\nLoading data...")
-        df = load_data()
-        if not df.empty:
-            print(f"✓ Loaded {len(df)} records")
-            print(f"✓ Found {df['photo'].notna().sum()} stores with photos")
+        dataset = load_dataset()
+        if dataset.processed_data:
+            print(f"✓ Loaded {dataset.summary.total_stores} stores across {dataset.summary.total_states} states")
+            print(f"✓ Dataset version {dataset.version}")
         else:
             print("✗ No data loaded")
         
@@ -0,0 +1,218 @@
+"""Fingerprinted, minified and pre-compressed CSS and JS bundles.
+
+The stylesheets and scripts in static/css and static/js are combined into
+the bundles listed in ``BUNDLES``, minified, and written to static/dist
+with a content hash in the file name:
+
+    static/dist/site.3f9c2a1b7e.css     (+ .gz, and .br with brotli)
+    static/dist/manifest.json           bundle name -> built file
+
+Because a bundle's URL changes whenever its content does, the app serves
+these files with a year-long ``immutable`` Cache-Control and picks the
+.br or .gz variant the browser accepts. Templates link bundles with
+``asset_url('site.css')``.
+
+The app rebuilds stale bundles in ``create_app()``; a deploy step with a
+read-only static directory can run this module instead:
+
+    python assets.py [--force]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+
+logger = logging.getLogger(__name__)
+
+base_dir = os.path.abspath(os.path.dirname(__file__))
+STATIC_DIR = os.path.join(base_dir, 'static')
+# Relative to STATIC_DIR
+BUILD_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+
+# Bundle name -> source files under STATIC_DIR, in cascade order. site.css and
+# site.js are on every page; each page adds its own bundle after them.
+BUNDLES = {
+    'site.css': ['css/style.css', 'css/base.css'],
+    'home.css': ['css/home.css'],
+    'state.css': ['css/listing.css', 'css/state.css'],
+    'city.css': ['css/listing.css', 'css/city.css'],
+    'search.css': ['css/search.css'],
+    'about.css': ['css/about.css'],
+    'sitemap.css': ['css/sitemap.css'],
+    '404.css': ['css/error-pages.css', 'css/404.css'],
+    'error.css': ['css/error-pages.css', 'css/error.css'],
+    'site.js': ['js/site.js'],
+    'state.js': ['js/state.js'],
+    'city.js': ['js/city.js'],
+    'search.js': ['js/search.js'],
+    'sitemap.js': ['js/sitemap.js']
+}
+
+# Compressed variants, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.S)
+CSS_STRING_RE = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')''')
+CSS_SPACE_RE = re.compile(r'\s+')
+# Whitespace that can go: around braces, semicolons and commas, and after a
+# colon. Space before a colon is kept, since "a :hover" differs from "a:hover".
+CSS_PUNCTUATION_RE = re.compile(r'\s*([{};,])\s*|:\s+')
+
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet."""
+    if rcssmin is not None:
+        return rcssmin.cssmin(css)
+
+    css = CSS_COMMENT_RE.sub('', css)
+    # Leave quoted strings alone; only the text between them is compacted
+    parts = CSS_STRING_RE.split(css)
+    for i in range(0, len(parts), 2):
+        text = CSS_SPACE_RE.sub(' ', parts[i])
+        parts[i] = CSS_PUNCTUATION_RE.sub(lambda m: m.group(1) or ':', text)
+    return ''.join(parts).replace(';}', '}').strip()
+
+def minify_js(js):
+    """Drop indentation, blank lines and whole-line comments from a script.
+
+    Deliberately conservative: statements and strings are left as written,
+    so this is safe for scripts without multi-line template literals.
+    """
+    if rjsmin is not None:
+        return rjsmin.jsmin(js)
+
+    lines = []
+    for line in js.splitlines():
+        line = line.strip()
+        if line and not line.startswith('//'):
+            lines.append(line)
+    return '\n'.join(lines)
+
+def sources_digest(static_dir=STATIC_DIR, bundles=BUNDLES):
+    """Cheap fingerprint of every source file's size and mtime."""
+    stats = []
+    for name, sources in sorted(bundles.items()):
+        for source in sources:
+            try:
+                stat = os.stat(os.path.join(static_dir, source))
+                stats.append((name, source, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                stats.append((name, source, None, None))
+    return hashlib.sha256(repr(stats).encode('utf-8')).hexdigest()[:16]
+
+def load_manifest(static_dir=STATIC_DIR):
+    """Return the manifest of the last build, or None."""
+    try:
+        with open(os.path.join(static_dir, BUILD_DIR, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def build_bundle(name, sources, static_dir=STATIC_DIR):
+    """Return the minified content of one bundle as bytes."""
+    texts = []
+    for source in sources:
+        with open(os.path.join(static_dir, source), encoding='utf-8') as f:
+            texts.append(f.read())
+    if name.endswith('.css'):
+        return '\n'.join(minify_css(text) for text in texts).encode('utf-8')
+    # Keep each script's statements apart when a file lacks a trailing semicolon
+    return ';\n'.join(minify_js(text) for text in texts).encode('utf-8')
+
+def build_assets(static_dir=STATIC_DIR, bundles=BUNDLES, force=False):
+    """Build every bundle whose sources changed and return the manifest.
+
+    Files from the previous build are kept alongside the new ones so pages
+    rendered (or cached) just before a deploy can still load them; older
+    ones are removed.
+    """
+    digest = sources_digest(static_dir, bundles)
+    previous = load_manifest(static_dir)
+    if not force and previous is not None and previous.get('sources') == digest:
+        return previous
+
+    out_dir = os.path.join(static_dir, BUILD_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    files = {}
+    for name, sources in bundles.items():
+        body = build_bundle(name, sources, static_dir)
+        stem, extension = os.path.splitext(name)
+        filename = f'{stem}.{hashlib.sha256(body).hexdigest()[:10]}{extension}'
+        files[name] = f'{BUILD_DIR}/{filename}'
+
+        path = os.path.join(out_dir, filename)
+        if os.path.exists(path):
+            continue
+        _write_atomic(path, body)
+        _write_atomic(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+        if brotli is not None:
+            _write_atomic(path + '.br', brotli.compress(body, quality=11))
+
+    manifest = {'sources': digest, 'files': files}
+    _write_atomic(os.path.join(out_dir, MANIFEST_NAME),
+                  json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    keep = {os.path.basename(path) for path in files.values()}
+    if previous is not None:
+        keep.update(os.path.basename(path) for path in previous.get('files', {}).values())
+    for filename in os.listdir(out_dir):
+        if filename == MANIFEST_NAME or filename.endswith('.tmp'):
+            continue
+        if re.sub(r'\.(gz|br)$', '', filename) not in keep:
+            os.remove(os.path.join(out_dir, filename))
+
+    logger.info(f"Built {len(files)} asset bundles ({digest})")
+    return manifest
+
+def compressed_variant(static_dir, filename, accept_encodings):
+    """Return the ``(encoding, filename)`` to send for ``accept_encodings``.
+
+    Picks the preferred pre-compressed variant the client accepts, or
+    ``(None, filename)`` to send the file as is.
+    """
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and os.path.exists(os.path.join(static_dir, filename + suffix)):
+            return encoding, filename + suffix
+    return None, filename
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the fingerprinted CSS and JS bundles.')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if no source changed')
+    args = parser.parse_args()
+
+    manifest = build_assets(force=args.force)
+    for name, path in sorted(manifest['files'].items()):
+        full_path = os.path.join(STATIC_DIR, path)
+        sizes = [f"{os.path.getsize(full_path + suffix)}"
+                 for suffix in ('', '.gz', '.br') if os.path.exists(full_path + suffix)]
+        print(f"{name:<14} {path:<32} {' / '.join(sizes)} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""Queue-based logging that keeps file I/O off the request path.
+
+Loggers get a ``NonBlockingQueueHandler``, which only rate-limits the
+record, tags it with the current request and puts it on a bounded
+in-process queue. If the queue is full, the record is dropped and counted
+rather than blocking. A ``LogWriter`` thread drains the queue in batches,
+formats records (structured JSON for the log file) and flushes each
+handler once per batch. ``BatchedRotatingFileHandler`` rotates on a byte
+count it tracks itself, so writes are not flushed one at a time.
+
+Rate limiting is per call site and applies below ERROR. Once a logging
+line emits more than ``burst`` records in ``window`` seconds, further
+records from it are dropped until the window ends. The next record that
+gets through carries a ``suppressed`` count, so a crawler storm of 404s
+becomes a few lines plus a tally. Errors are never dropped, since one
+``except`` block logs every distinct failure of its route.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, RotatingFileHandler
+
+try:
+    from flask import has_request_context, request
+except ImportError:
+    has_request_context = None
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as one JSON object per line."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName
+        }
+        for field in ('method', 'path', 'suppressed'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = ''.join(traceback.format_exception(*record.exc_info)).rstrip()
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Allows at most ``burst`` records per call site per ``window`` seconds.
+
+    Records at ERROR and above always pass.
+    """
+
+    def __init__(self, burst=20, window=10.0):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.suppressed_total = 0
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+        key = (record.name, record.levelno, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records in window, suppressed since last emitted]
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                site = self._sites[key] = [now, 0, suppressed]
+            site[1] += 1
+            if site[1] > self.burst:
+                site[2] += 1
+                self.suppressed_total += 1
+                return False
+            if site[2]:
+                record.suppressed = site[2]
+                site[2] = 0
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queues records for the writer thread, dropping them when the queue is full."""
+
+    def __init__(self, log_queue, writer):
+        super().__init__(log_queue)
+        self.writer = writer
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message now, while its arguments are unchanged, but
+        # leave formatting and tracebacks to the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        if has_request_context is not None and has_request_context():
+            record.method = request.method
+            record.path = request.path
+        return record
+
+    def enqueue(self, record):
+        # Threads don't survive fork, so each worker starts its own writer
+        if self.writer.pid != os.getpid():
+            self.writer.start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class BatchedRotatingFileHandler(RotatingFileHandler):
+    """A RotatingFileHandler that flushes only when asked to.
+
+    ``LogWriter`` calls ``flush_batch()`` once per batch. Rollover is
+    decided from a running byte count instead of seeking, and seeking
+    would flush after every record. The count covers only this process's
+    writes, so ``flush_batch()`` re-syncs it from the file size. With
+    several processes writing one file, rollover can still lag by up to a
+    batch from each of them.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._bytes = self._current_size()
+
+    def _current_size(self):
+        try:
+            return os.path.getsize(self.baseFilename)
+        except OSError:
+            return 0
+
+    def flush(self):
+        # StreamHandler.emit() flushes after every record; defer to flush_batch()
+        pass
+
+    def flush_batch(self):
+        with self.lock:
+            if self.stream is not None:
+                self.stream.flush()
+                # Picks up writes by other processes sharing the file
+                self._bytes = self._current_size()
+
+    def _encoded_length(self, message):
+        return len(message.encode(self.encoding or 'utf-8', 'replace'))
+
+    def _should_rollover(self, length):
+        if self.maxBytes <= 0:
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+            self._bytes = self._current_size()
+        return self._bytes + length >= self.maxBytes
+
+    def shouldRollover(self, record):
+        return self._should_rollover(self._encoded_length(f'{self.format(record)}{self.terminator}'))
+
+    def doRollover(self):
+        super().doRollover()
+        self._bytes = self._current_size()
+
+    def emit(self, record):
+        try:
+            message = f'{self.format(record)}{self.terminator}'
+            length = self._encoded_length(message)
+            if self._should_rollover(length):
+                self.doRollover()
+            self.stream.write(message)
+            self._bytes += length
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.flush_batch()
+        super().close()
+
+
+class LogWriter:
+    """Background thread that writes queued records to ``handlers`` in batches."""
+
+    _STOP = object()
+
+    def __init__(self, log_queue, handlers, batch_size=256, flush_interval=1.0):
+        self.queue = log_queue
+        self.handlers = list(handlers)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pid = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self.pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self.pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Write everything queued so far and stop the thread."""
+        if self._thread is None or self.pid != os.getpid() or not self._thread.is_alive():
+            return
+        self.queue.put(self._STOP)
+        self._thread.join(timeout=5)
+
+    def _handle(self, record):
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+    def _flush(self):
+        for handler in self.handlers:
+            try:
+                if hasattr(handler, 'flush_batch'):
+                    handler.flush_batch()
+                else:
+                    handler.flush()
+            except Exception:
+                pass
+
+    def _run(self):
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+
+            stop = record is self._STOP
+            written = 0
+            while not stop:
+                self._handle(record)
+                written += 1
+                if written >= self.batch_size:
+                    break
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                stop = record is self._STOP
+            self._flush()
+            if stop:
+                return
+
+
+def setup_async_logging(loggers, log_file, level=logging.INFO, max_bytes=10 * 1024 * 1024,
+                        backup_count=5, queue_size=10000, burst=20, window=10.0, extra_handlers=()):
+    """Route ``loggers`` through a queue to a JSON rotating log file.
+
+    ``extra_handlers`` (e.g. a console handler) are also written by the
+    writer thread with their own formatters. Returns the queue handler, whose
+    ``writer`` and rate limit filter expose counters.
+    """
+    file_handler = BatchedRotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                              encoding='utf-8')
+    file_handler.setLevel(level)
+    file_handler.setFormatter(JSONFormatter())
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    writer = LogWriter(log_queue, [file_handler, *extra_handlers])
+    handler = NonBlockingQueueHandler(log_queue, writer)
+    handler.setLevel(level)
+    handler.rate_limit = RateLimitFilter(burst=burst, window=window)
+    handler.addFilter(handler.rate_limit)
+
+    for logger in loggers:
+        logger.addHandler(handler)
+        logger.setLevel(level)
+
+    writer.start()
+    atexit.register(writer.stop)
+    return handler
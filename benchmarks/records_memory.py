@@ -0,0 +1,93 @@
+"""Memory benchmark: slotted records vs. the old dict-per-store structure.
+
+Cleans the synthetic dataset from synthetic_data.py for each size and
+measures the memory held by the processed state/city/store hierarchy (the
+DataFrame itself is excluded) with tracemalloc.
+
+Usage:
+    python benchmarks/records_memory.py [--sizes 10000 100000 1000000]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import process_data, safe_slugify  # noqa: E402
+from ingest import clean_dataframe  # noqa: E402
+from synthetic_data import make_raw_dataset  # noqa: E402
+
+
+def make_dataset(store_count, seed=0):
+    """Return the cleaned synthetic dataset of ``store_count`` stores, see synthetic_data.py."""
+    return clean_dataframe(make_raw_dataset(store_count, seed))
+
+
+def legacy_process_data(df):
+    """The previous dict-based structure, kept for comparison."""
+    processed_data = {}
+    for state_name, state_group in df.groupby('state'):
+        cities = []
+        for city_name, city_group in state_group.groupby('city'):
+            stores = city_group.sort_values('review_count', ascending=False)
+            cities.append({
+                'name': city_name,
+                'slug': safe_slugify(city_name),
+                'store_count': len(stores),
+                'total_reviews': int(stores['review_count'].sum()),
+                'stores': stores.to_dict('records')
+            })
+        cities.sort(key=lambda x: (x['store_count'], x['total_reviews']), reverse=True)
+        processed_data[state_name] = {
+            'name': state_name,
+            'slug': safe_slugify(state_name),
+            'store_count': sum(city['store_count'] for city in cities),
+            'city_count': len(cities),
+            'total_reviews': sum(city['total_reviews'] for city in cities),
+            'cities': cities
+        }
+    return processed_data
+
+
+def measure(build, df):
+    """Return ``(held_bytes, seconds)`` for building a structure from ``df``.
+
+    Timing and memory are taken in separate runs because tracemalloc slows
+    allocation-heavy code down several times over.
+    """
+    gc.collect()
+    start = time.perf_counter()
+    result = build(df)
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(df)
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return held, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'stores':>10} {'dicts MB':>10} {'records MB':>11} {'saved':>7} {'dicts s':>8} {'records s':>10}")
+    for size in args.sizes:
+        df = make_dataset(size)
+        legacy_bytes, legacy_seconds = measure(legacy_process_data, df)
+        record_bytes, record_seconds = measure(process_data, df)
+        saved = 1 - record_bytes / legacy_bytes if legacy_bytes else 0
+        print(f"{size:>10} {legacy_bytes / 1e6:>10.1f} {record_bytes / 1e6:>11.1f} {saved:>7.0%} "
+              f"{legacy_seconds:>8.2f} {record_seconds:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""Scaling benchmarks: pipeline stages, search and page routes by dataset size.
+
+For each size a synthetic spreadsheet (see synthetic_data.py) is generated
+if missing, then:
+
+* every data stage is timed on its own: Excel parse, cleaning, snapshot
+  write/read, ``load_data()``, ``process_data()``, the search and route
+  indexes, the summary and the sitemap (best of ``--repeat`` runs);
+* ``SearchIndex.search()`` and ``suggest()`` are timed over a query mix
+  drawn from the data (state and city names, prefixes, store words, misses);
+* the dataset is swapped into the app and a Flask test-client load run
+  requests a mix of routes, reporting throughput and p50/p99 per route.
+
+The page cache is disabled during the load run unless ``--page-cache`` is
+given, so routes measure rendering rather than cache hits.
+
+Results are written as JSON to ``benchmarks/results/``, tagged with the git
+commit. ``--compare`` diffs against an earlier results file and exits
+non-zero if any timing regressed by more than ``--threshold``.
+
+Usage:
+    python benchmarks/scale.py [--sizes 10000 100000 1000000] [--requests 500]
+    python benchmarks/scale.py --sizes 10000 --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from synthetic_data import DEFAULT_OUT_DIR, ensure_dataset  # noqa: E402
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+
+def best_of(repeat, func, *args):
+    """Return ``(result, best_seconds)`` over ``repeat`` calls of ``func``."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        result = None
+        gc.collect()
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def latency_stats(latencies, elapsed=None):
+    """Summarize per-call latencies in seconds as milliseconds."""
+    values = np.asarray(latencies) * 1000
+    stats = {
+        'count': len(values),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3)
+    }
+    if elapsed:
+        stats['per_second'] = round(len(values) / elapsed, 1)
+    return stats
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def bench_stages(app_module, source_path, snapshot_dir, repeat):
+    """Time each data stage separately; returns ``(stage_seconds, df, processed_data)``."""
+    import ingest
+    from search_index import SearchIndex
+    from summary import DatasetSummary
+
+    stages = {}
+    # Parsing Excel dominates at scale and is not worth repeating
+    raw, stages['read_source'] = best_of(1, ingest.read_source, source_path)
+    clean_timings = {}
+    df, stages['clean'] = best_of(repeat, lambda: ingest.clean_dataframe(raw, timings=clean_timings))
+    for stage, seconds in clean_timings.items():
+        stages[f'clean.{stage}'] = seconds / repeat
+    del raw
+
+    df = ingest._to_storable(df)
+    _, stages['write_snapshot'] = best_of(repeat, ingest.write_snapshot, df, source_path, snapshot_dir)
+    _, stages['read_snapshot'] = best_of(repeat, ingest.read_snapshot, snapshot_dir)
+
+    app_module.data_file = source_path
+    app_module.snapshot_dir = snapshot_dir
+    df, stages['load_data'] = best_of(repeat, app_module.load_data)
+
+    processed_data, stages['process_data'] = best_of(repeat, app_module.process_data, df)
+    _, stages['search_index'] = best_of(repeat, SearchIndex, processed_data)
+    _, stages['route_index'] = best_of(repeat, app_module.build_route_index, processed_data)
+    _, stages['summary'] = best_of(repeat, DatasetSummary, processed_data, app_module.regions)
+    _, stages['sitemap'] = best_of(repeat, app_module.create_sitemap_builder, df, processed_data)
+    return {stage: round(seconds, 5) for stage, seconds in stages.items()}, df, processed_data
+
+
+def make_queries(processed_data, rng, count):
+    """Return ``(kind, query)`` pairs mixing hits of each kind and misses."""
+    states = list(processed_data.values())
+    cities = [city for state_data in states for city in state_data.cities]
+    stores = [store for city in rng.sample(cities, min(len(cities), 200)) for store in city.stores[:3]]
+
+    makers = {
+        'state': lambda: rng.choice(states).name,
+        'city': lambda: rng.choice(cities).name,
+        'prefix': lambda: rng.choice(cities).name[:rng.randint(2, 4)],
+        'store_word': lambda: rng.choice(stores).name.split()[0],
+        'multi_word': lambda: f'{rng.choice(stores).name.split()[0]} {rng.choice(cities).name}',
+        'miss': lambda: f'zzq{rng.randint(0, 10**6)}'
+    }
+    return [(kind, make().lower()) for _ in range(count // len(makers)) for kind, make in makers.items()]
+
+def bench_search(processed_data, rng, count):
+    """Time search and suggest calls per query kind."""
+    from search_index import SearchIndex
+    index = SearchIndex(processed_data)
+    queries = make_queries(processed_data, rng, count)
+
+    results = {}
+    for operation, call in (('search', index.search), ('suggest', index.suggest)):
+        latencies = {}
+        for kind, query in queries:
+            start = time.perf_counter()
+            call(query)
+            latencies.setdefault(kind, []).append(time.perf_counter() - start)
+        all_latencies = [value for values in latencies.values() for value in values]
+        results[operation] = latency_stats(all_latencies, sum(all_latencies))
+        results[operation]['by_kind'] = {kind: latency_stats(values) for kind, values in latencies.items()}
+    return results
+
+
+def make_requests(dataset, rng, count):
+    """Return ``(route, url)`` pairs in a traffic-like mix."""
+    states = list(dataset.processed_data.values())
+    city_paths = [f'/state/{state_data.slug}/{city.slug}' for state_data in states for city in state_data.cities]
+    words = ['vintage', 'resale', 'spring', 'oak', 'boutique', 'thrift', 'lake', 'texas']
+
+    mix = [
+        ('city', 50, lambda: rng.choice(city_paths)),
+        ('state', 15, lambda: f'/state/{rng.choice(states).slug}'),
+        ('search', 12, lambda: f'/search?q={rng.choice(words)}'),
+        ('search_suggest', 10, lambda: f'/search/suggest?q={rng.choice(words)[:3]}'),
+        ('home', 5, lambda: '/'),
+        ('not_found', 5, lambda: f'/state/{rng.choice(states).slug}/no-such-city-{rng.randint(0, 10**6)}'),
+        ('sitemap', 2, lambda: '/sitemap'),
+        ('sitemap_xml', 1, lambda: '/sitemap.xml')
+    ]
+    routes = rng.choices(mix, weights=[weight for _, weight, _ in mix], k=count)
+    return [(route, make()) for route, _, make in routes]
+
+def bench_routes(app_module, rng, count):
+    """Request a route mix through the test client; latency and throughput per route."""
+    client = app_module.app.test_client()
+    requests = make_requests(app_module.current_dataset(), rng, count)
+
+    # Warm up templates and code paths so the first requests aren't outliers
+    for _, url in requests[:20]:
+        client.get(url)
+
+    latencies = {}
+    statuses = {}
+    started = time.perf_counter()
+    for route, url in requests:
+        start = time.perf_counter()
+        response = client.get(url)
+        response.get_data()
+        latencies.setdefault(route, []).append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - started
+
+    results = {route: latency_stats(values, sum(values)) for route, values in sorted(latencies.items())}
+    results['all'] = latency_stats([value for values in latencies.values() for value in values], elapsed)
+    results['all']['statuses'] = {str(status): count for status, count in sorted(statuses.items())}
+    return results
+
+
+def run_size(app_module, size, args, rng):
+    from metrics import process_memory
+
+    source_path = ensure_dataset(size, args.data_dir, args.seed)
+    with tempfile.TemporaryDirectory(prefix='bench-snapshot-') as snapshot_dir:
+        stages, df, processed_data = bench_stages(app_module, source_path, snapshot_dir, args.repeat)
+        result = {
+            'stores': len(df),
+            'states': len(processed_data),
+            'cities': sum(state_data.city_count for state_data in processed_data.values()),
+            'stages': stages,
+            'search': bench_search(processed_data, rng, args.queries)
+        }
+        del df, processed_data
+
+        app_module.swap_dataset(app_module.build_dataset())
+        result['routes'] = bench_routes(app_module, rng, args.requests)
+        result['memory_bytes'] = {kind: value for (kind,), value in process_memory().items()}
+    return result
+
+
+def compare(baseline, current, threshold):
+    """Print timing changes against ``baseline``; return the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created')}):")
+    for size, result in current['sizes'].items():
+        old = baseline.get('sizes', {}).get(size)
+        if old is None:
+            continue
+        pairs = [(f'stage {stage}', old['stages'].get(stage), seconds)
+                 for stage, seconds in result['stages'].items() if '.' not in stage]
+        pairs = [(name, None if before is None else before * 1000, after * 1000) for name, before, after in pairs]
+        for operation in ('search', 'suggest'):
+            for stat in ('p50_ms', 'p99_ms'):
+                pairs.append((f'{operation} {stat}', old['search'].get(operation, {}).get(stat),
+                              result['search'][operation][stat]))
+        for route, stats in result['routes'].items():
+            for stat in ('p50_ms', 'p99_ms'):
+                pairs.append((f'route {route} {stat}', old['routes'].get(route, {}).get(stat), stats[stat]))
+
+        print(f"\n{size} stores")
+        for name, before, after in pairs:
+            if not before:
+                continue
+            change = after / before - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"  {name:<32} {before:>10.2f}ms {after:>10.2f}ms {change:>+8.1%}{flag}")
+    return regressions
+
+def print_summary(size, result):
+    print(f"\n{size} stores: {result['cities']} cities in {result['states']} states")
+    for stage, seconds in result['stages'].items():
+        print(f"  {stage:<28} {seconds * 1000:>10.1f}ms")
+    for operation in ('search', 'suggest'):
+        stats = result['search'][operation]
+        print(f"  {operation:<28} p50 {stats['p50_ms']:.3f}ms  p99 {stats['p99_ms']:.3f}ms  "
+              f"{stats['per_second']:.0f}/s")
+    print(f"  {'route':<16} {'requests':>8} {'per sec':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for route, stats in result['routes'].items():
+        print(f"  {route:<16} {stats['count']:>8} {stats['per_second']:>9.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the best is kept')
+    parser.add_argument('--queries', type=int, default=600, help='Search queries per size')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per size in the load run')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=DEFAULT_OUT_DIR, help='Where synthetic datasets are kept')
+    parser.add_argument('--page-cache', action='store_true', help='Serve repeat pages from the page cache')
+    parser.add_argument('--out', default=None, help='Results file (default: benchmarks/results/<time>-<commit>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown reported as a regression')
+    args = parser.parse_args()
+
+    # Read by app at import time
+    os.environ['DATA_RELOAD_INTERVAL'] = '0'
+    # Rendering would otherwise queue photo downloads in the background
+    os.environ['IMAGE_PROXY'] = 'false'
+    if not args.page_cache:
+        os.environ['PAGE_CACHE_BACKEND'] = 'lru'
+        os.environ['PAGE_CACHE_MAX_BYTES'] = '0'
+    import app as app_module
+
+    rng = random.Random(args.seed)
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'repeat': args.repeat, 'queries': args.queries, 'requests': args.requests,
+                    'seed': args.seed, 'page_cache': args.page_cache},
+        'sizes': {}
+    }
+    for size in args.sizes:
+        result = run_size(app_module, size, args, rng)
+        results['sizes'][str(size)] = result
+        print_summary(size, result)
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults written to {out_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Startup benchmarks: import time, create_app() and time to first response.
+
+Each run starts a fresh interpreter that imports ``app``, calls
+``create_app()`` and requests ``/`` through the Flask test client, timing
+each step. Runs are repeated and the median kept, in two modes:
+
+* ``lazy``: ``create_app(preload=False)``, so the first request builds the
+  dataset, as a development server or a cold worker would;
+* ``preload``: ``create_app(preload=True)``, so the dataset is built before
+  the first request, as a preloading WSGI master does before forking.
+
+``--importtime`` also lists the slowest modules imported by ``import app``,
+from ``python -X importtime``.
+
+Results are written as JSON to ``benchmarks/results/``, tagged with the git
+commit. ``--compare`` diffs against an earlier results file and exits
+non-zero if any timing regressed by more than ``--threshold``.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--importtime]
+    python benchmarks/startup.py --compare benchmarks/results/<earlier>-startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+from scale import RESULTS_DIR, ROOT, git_commit
+
+MODES = ('lazy', 'preload')
+
+# Run in a fresh interpreter; prints the timings as JSON on the last line
+CHILD = '''
+import json, logging, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+logging.disable(logging.CRITICAL)
+app.create_app(preload=sys.argv[1] == 'preload')
+created = time.perf_counter()
+status = app.app.test_client().get('/').status_code
+responded = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'create_app': created - imported,
+    'first_response': responded - created,
+    'total': responded - start,
+    'status': status
+}))
+'''
+
+
+def run_child(mode, env):
+    result = subprocess.run([sys.executable, '-c', CHILD, mode], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def bench_mode(mode, runs, env):
+    """Return the median of each timing over ``runs`` fresh processes."""
+    samples = [run_child(mode, env) for _ in range(runs)]
+    if any(sample['status'] != 200 for sample in samples):
+        raise RuntimeError(f"GET / failed in {mode} mode: {[sample['status'] for sample in samples]}")
+    return {step: statistics.median(sample[step] for sample in samples)
+            for step in ('import', 'create_app', 'first_response', 'total')}
+
+def pandas_at_import(env):
+    """Whether ``import app`` alone loads pandas."""
+    result = subprocess.run([sys.executable, '-c', "import sys, app; print('pandas' in sys.modules)"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1] == 'True'
+
+def slowest_imports(env, count=15):
+    """Return ``[(module, cumulative_seconds)]`` for the slowest imports of ``app``."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Only modules app imports directly, so nested ones aren't counted twice
+        if name.startswith(' ' * 3) and not name.startswith(' ' * 4):
+            modules.append((name.strip(), int(cumulative) / 1e6))
+    return sorted(modules, key=lambda item: item[1], reverse=True)[:count]
+
+def compare(current, baseline, threshold):
+    """Print timing changes against ``baseline``; return the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with {baseline.get('commit')} ({baseline.get('created')}):")
+    for mode, result in current['modes'].items():
+        old = baseline.get('modes', {}).get(mode, {})
+        for step, seconds in result.items():
+            before = old.get(step)
+            if not isinstance(seconds, float) or not before:
+                continue
+            change = seconds / before - 1
+            flag = ''
+            if change > threshold:
+                flag = '  REGRESSION'
+                regressions += 1
+            print(f"  {mode + ' ' + step:<28} {before * 1000:>10.1f}ms {seconds * 1000:>10.1f}ms "
+                  f"{change:>+8.1%}{flag}")
+    return regressions
+
+def print_summary(results):
+    print(f"{'mode':<10} {'import':>10} {'create_app':>11} {'first GET':>10} {'total':>10}")
+    for mode, result in results['modes'].items():
+        print(f"{mode:<10} {result['import'] * 1000:>8.1f}ms {result['create_app'] * 1000:>9.1f}ms "
+              f"{result['first_response'] * 1000:>8.1f}ms {result['total'] * 1000:>8.1f}ms")
+    print(f"pandas loaded by 'import app': {'yes' if results['pandas_at_import'] else 'no'}")
+    if results.get('slowest_imports'):
+        print("\nSlowest imports:")
+        for name, seconds in results['slowest_imports']:
+            print(f"  {name:<32} {seconds * 1000:>8.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes per mode; the median is kept')
+    parser.add_argument('--importtime', action='store_true', help='List the slowest imports of app')
+    parser.add_argument('--out', default=None,
+                        help='Results file (default: benchmarks/results/<time>-<commit>-startup.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.1, help='Slowdown reported as a regression')
+    args = parser.parse_args()
+
+    # Measure startup alone; the reloader and profiler would only add threads
+    env = dict(os.environ, DATA_RELOAD_INTERVAL='0', PROFILE_SLOW_REQUEST_MS='0', IMAGE_PROXY='false')
+    # Build the snapshot first so no run pays for parsing the spreadsheet
+    run_child('preload', env)
+
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'runs': args.runs},
+        'pandas_at_import': pandas_at_import(env),
+        'modes': {mode: bench_mode(mode, args.runs, env) for mode in MODES}
+    }
+    if args.importtime:
+        results['slowest_imports'] = slowest_imports(env)
+    print_summary(results)
+
+    out_path = args.out or os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}-startup.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(out_path, 'w') as f:
+        json.dump(results, f, indent=1)
+    print(f"\nResults written to {out_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+"""Synthetic store spreadsheets at national scale for benchmarks.
+
+Writes .xlsx files with the same columns as the real source spreadsheet
+(``ingest.REQUIRED_COLUMNS``), spread over every state in ``app.regions``.
+City sizes follow a long-tailed distribution: many small towns, a few
+large metros. The rows carry the same mess the cleaning step handles:
+padded strings, missing review counts and photos, photo URLs without a
+scheme, extra blank lines between description paragraphs, and city names
+shared between states or differing only in punctuation.
+
+Files are written with openpyxl's streaming writer, so memory stays flat
+even at a million rows.
+
+Usage:
+    python benchmarks/synthetic_data.py [--sizes 10000 100000 1000000] [--out benchmarks/data]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from ingest import REQUIRED_COLUMNS  # noqa: E402
+
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+CITY_PREFIXES = ['Spring', 'River', 'Oak', 'Maple', 'Cedar', 'Fair', 'Green', 'Lake', 'Mill', 'Pine',
+                 'Clear', 'Red', 'Stone', 'Elm', 'Ash', 'Bright', 'Glen', 'Fox', 'Bay', 'North']
+CITY_SUFFIXES = ['field', 'ton', 'wood', 'view', 'dale', 'ville', 'port', 'ford', 'burg', 'haven',
+                 ' Falls', ' Heights', ' Park', ' Springs', ' City', ' Grove', ' Hills', ' Creek']
+# Names that occur in several states, and pairs that slugify alike
+SHARED_CITY_NAMES = ['Springfield', 'Franklin', 'Greenville', 'Clinton', 'Salem', 'Madison',
+                     'St. Louis', 'St Louis', 'Fort Myers', 'Ft. Myers']
+
+STORE_WORDS = ['Vintage', 'Resale', 'Consignment', 'Thrift', 'Closet', 'Boutique', 'Treasures',
+               'Finds', 'Exchange', 'Attic', 'Market', 'Encore', 'Second Look', 'Rerun', 'Swap']
+STREET_NAMES = ['Main St', 'Oak Ave', 'Broadway', 'Market St', 'Elm St', 'Park Ave', 'Church St',
+                'High St', 'Center St', 'Washington Blvd', 'Lake Rd', 'Mill Rd']
+DESCRIPTION_PARAGRAPHS = [
+    'Gently used clothing, furniture and home goods at a fraction of retail prices.',
+    'We accept designer apparel, handbags and accessories on consignment year round.',
+    'Drop off items during business hours; consignors earn a share of every sale.',
+    'New arrivals every week, with seasonal markdowns on items older than sixty days.',
+    'Our team prices every piece by hand and checks it for quality before it hits the floor.'
+]
+
+
+def _states():
+    """Every state in ``app.regions``.
+
+    Imported on use, since scale.py sets app's environment before importing it.
+    """
+    from app import regions
+    return [state for states in regions.values() for state in states]
+
+def _city_names(rng, count):
+    """Return ``count`` distinct generated city names."""
+    names = [f'{prefix}{suffix}' for prefix in CITY_PREFIXES for suffix in CITY_SUFFIXES]
+    names = list(rng.permutation(names))
+    base = list(names)
+    while len(names) < count:
+        names.extend(f'{name} {len(names) // len(base) + 1}' for name in base)
+    return names[:count]
+
+def make_raw_dataset(store_count, seed=0, stores_per_city=30):
+    """Return a raw spreadsheet DataFrame with ``store_count`` stores."""
+    rng = np.random.default_rng(seed)
+    states = _states()
+    city_count = max(len(states), store_count // stores_per_city)
+
+    # Each city belongs to one state; a few shared names recur across states
+    names = _city_names(rng, city_count)
+    city_states = np.array([states[i % len(states)] for i in range(city_count)], dtype=object)
+    shared = rng.choice(city_count, size=min(city_count // 10, len(SHARED_CITY_NAMES) * len(states)),
+                        replace=False)
+    for i, city_id in enumerate(shared):
+        names[city_id] = SHARED_CITY_NAMES[i % len(SHARED_CITY_NAMES)]
+    city_names = np.array(names, dtype=object)
+
+    # Long-tailed city sizes: Zipf-like weights over a shuffled city order
+    weights = 1.0 / np.arange(1, city_count + 1) ** 0.9
+    weights = rng.permutation(weights / weights.sum())
+    city_ids = rng.choice(city_count, size=store_count, p=weights)
+    rows = np.arange(store_count)
+
+    store_names = pd.Series(rng.choice(STORE_WORDS, store_count)).str.cat(
+        pd.Series(rng.choice(STORE_WORDS, store_count)), sep=' ')
+    store_names = store_names + pd.Series(rows).map(lambda i: f' #{i}')
+    # Stray whitespace the cleaning step strips
+    padded = rng.random(store_count) < 0.05
+    store_names[padded] = '  ' + store_names[padded] + ' '
+
+    addresses = pd.Series(rng.integers(1, 9999, store_count)).astype(str) + ' ' + \
+        pd.Series(rng.choice(STREET_NAMES, store_count))
+
+    review_counts = rng.integers(0, 1500, store_count).astype(float)
+    review_counts[rng.random(store_count) < 0.08] = np.nan
+
+    paragraph_counts = rng.integers(1, 4, store_count)
+    separators = rng.choice(['\n\n', '\n\n\n\n', ' \n\n  '], store_count)
+    descriptions = [separators[i].join(DESCRIPTION_PARAGRAPHS[(i + p) % len(DESCRIPTION_PARAGRAPHS)]
+                                       for p in range(paragraph_counts[i]))
+                    for i in range(store_count)]
+
+    websites = pd.Series(rows).map(lambda i: f'https://shop{i}.example.com').astype(object)
+    websites[rng.random(store_count) < 0.3] = None
+
+    phones = pd.Series(rows).map(lambda i: f'({200 + i % 800:03d}) 555-{i % 10000:04d}')
+
+    photo_roll = rng.random(store_count)
+    photos = pd.Series(rows).map(lambda i: f'https://images.example.com/stores/{i}.jpg').astype(object)
+    no_scheme = (photo_roll >= 0.85) & (photo_roll < 0.9)
+    photos[no_scheme] = photos[no_scheme].str.replace('https://', '', regex=False)
+    photos[photo_roll >= 0.9] = None
+
+    return pd.DataFrame({
+        'Business Name': store_names,
+        'Address': addresses,
+        'City': city_names[city_ids],
+        'State': city_states[city_ids],
+        'Number of Reviews': review_counts,
+        'New SEO Description V2': descriptions,
+        'Site': websites,
+        'Phone': phones,
+        'Photo': photos
+    }, columns=REQUIRED_COLUMNS)
+
+
+def write_xlsx(df, path):
+    """Stream ``df`` to an .xlsx file with constant memory."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Stores')
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        sheet.append([None if pd.isna(value) else value for value in row])
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    workbook.save(tmp_path)
+    os.replace(tmp_path, path)
+
+def dataset_path(store_count, out_dir=DEFAULT_OUT_DIR, seed=0):
+    return os.path.join(out_dir, f'stores-{store_count}-seed{seed}.xlsx')
+
+def ensure_dataset(store_count, out_dir=DEFAULT_OUT_DIR, seed=0):
+    """Return the path of the synthetic dataset, generating it if missing."""
+    path = dataset_path(store_count, out_dir, seed)
+    if not os.path.exists(path):
+        write_xlsx(make_raw_dataset(store_count, seed), path)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help='Output directory')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--force', action='store_true', help='Regenerate existing files')
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        path = dataset_path(size, args.out, args.seed)
+        if os.path.exists(path) and not args.force:
+            print(f"{path} exists, skipping")
+            continue
+        start = time.perf_counter()
+        df = make_raw_dataset(size, args.seed)
+        write_xlsx(df, path)
+        print(f"Wrote {size} stores in {df['City'].nunique()} city names to {path} "
+              f"({os.path.getsize(path) / 1e6:.1f} MB, {time.perf_counter() - start:.1f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,279 @@
+"""Export the directory as static, pre-compressed HTML.
+
+Every page except /search is a pure function of the dataset, so this walks
+processed_data and writes each page to disk for the web tier to serve
+directly:
+
+    index.html                      /
+    about/index.html                /about
+    sitemap/index.html              /sitemap
+    sitemap.xml                     /sitemap.xml (index)
+    sitemaps/sitemap-<n>.xml.gz     /sitemaps/sitemap-<n>.xml.gz
+    state/<state>/index.html        /state/<state>
+    state/<state>/<city>/index.html /state/<state>/<city>
+    404.html                        error page
+    static/dist/...                 the CSS and JS bundles pages link to
+    static/images/...               images pages link to, e.g. the default photo
+
+Each file gets .gz and, when the brotli package is installed, .br siblings
+for gzip_static/brotli_static style serving. Pages are rendered in a
+process pool. A manifest of per-page input fingerprints makes re-runs
+incremental: only pages whose data or templates changed are re-rendered,
+and only pages whose output changed are rewritten.
+
+Usage:
+    python export.py [--out DIR] [--workers N] [--base-url URL] [--force]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from app import app, base_dir, create_app, current_dataset, load_assets, reloader
+from assets import BUILD_DIR
+
+MANIFEST_NAME = '.export-manifest.json'
+DEFAULT_OUT_DIR = os.path.join(base_dir, 'build', 'site')
+
+_client = None
+
+
+def digest(*parts):
+    """Stable short hash of the repr of some plain values."""
+    return hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+
+def templates_digest():
+    """Hash of every template, so template edits re-render all pages."""
+    sha = hashlib.sha256()
+    template_dir = app.template_folder
+    for name in sorted(os.listdir(template_dir)):
+        with open(os.path.join(template_dir, name), 'rb') as f:
+            sha.update(name.encode('utf-8'))
+            sha.update(f.read())
+    return sha.hexdigest()[:32]
+
+def directory_digest(processed_data):
+    """Hash of every state and city listing shown in navigation and sitemaps."""
+    return digest([
+        (state.name, state.slug, state.store_count, state.city_count, state.total_reviews,
+         [(city.name, city.slug, city.store_count, city.total_reviews) for city in state.cities])
+        for state in processed_data.values()
+    ])
+
+def plan_pages(dataset, base_url):
+    """Return ``(url, relative_path, input_fingerprint)`` for every exported page."""
+    processed_data = dataset.processed_data
+    sitemap_builder = dataset.sitemap_builder
+    # The gazetteer decides every city page's nearby cities
+    base = digest(base_url, templates_digest(), load_assets()['files'], directory_digest(processed_data),
+                  dataset.gazetteer_version)
+    # Sitemaps also change when only a city's lastmod date moves
+    sitemap = digest(base, sitemap_builder.entries)
+
+    pages = [
+        ('/', 'index.html', base),
+        ('/about', 'about/index.html', base),
+        ('/sitemap', 'sitemap/index.html', base),
+        ('/sitemap.xml', 'sitemap.xml', sitemap),
+        ('/404', '404.html', base)
+    ]
+
+    for shard in range(sitemap_builder.shard_count):
+        path = f'sitemaps/sitemap-{shard}.xml.gz'
+        pages.append((f'/{path}', path, sitemap))
+
+    for state in processed_data.values():
+        pages.append((f'/state/{state.slug}', f'state/{state.slug}/index.html', base))
+        for city in state.cities:
+            stores = [tuple(store.to_dict().values()) for store in city.stores]
+            pages.append((
+                f'/state/{state.slug}/{city.slug}',
+                f'state/{state.slug}/{city.slug}/index.html',
+                digest(base, city.name, city.slug, stores)
+            ))
+    return pages
+
+
+def _write_atomic(path, data):
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def render_page(task):
+    """Render one page and write it plus its compressed variants.
+
+    Runs in pool workers; returns ``(url, content_sha256, written)``.
+    """
+    global _client
+    url, rel_path, out_dir, base_url, previous_sha = task
+    if _client is None:
+        _client = app.test_client()
+
+    response = _client.get(url, base_url=base_url)
+    body = response.get_data()
+    if response.status_code != 200 and url != '/404':
+        raise RuntimeError(f"{url} returned {response.status_code}")
+
+    content_sha = hashlib.sha256(body).hexdigest()
+    path = os.path.join(out_dir, rel_path)
+    if content_sha == previous_sha and os.path.exists(path):
+        return url, content_sha, False
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    _write_atomic(path, body)
+    if path.endswith('.gz'):
+        return url, content_sha, True
+    _write_atomic(path + '.gz', gzip.compress(body, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _write_atomic(path + '.br', brotli.compress(body, quality=11))
+    return url, content_sha, True
+
+
+def copy_images(out_dir):
+    """Copy static/images, e.g. the default store photo; return how many were copied.
+
+    These names aren't fingerprinted, so a file is re-copied when its size
+    or modification time changed.
+    """
+    source_dir = os.path.join(app.static_folder, 'images')
+    image_dir = os.path.join(out_dir, 'static', 'images')
+    os.makedirs(image_dir, exist_ok=True)
+    copied = 0
+    for filename in os.listdir(source_dir):
+        source = os.path.join(source_dir, filename)
+        target = os.path.join(image_dir, filename)
+        if not os.path.isfile(source):
+            continue
+        stat = os.stat(source)
+        try:
+            current = os.stat(target)
+            if current.st_size == stat.st_size and current.st_mtime == stat.st_mtime:
+                continue
+        except OSError:
+            pass
+        shutil.copy2(source, target)
+        copied += 1
+    return copied
+
+def copy_assets(out_dir):
+    """Copy the built bundles, their compressed variants and static/images; return how many were copied.
+
+    Bundles from earlier exports are removed, since every page linking to
+    them was re-rendered.
+    """
+    asset_dir = os.path.join(out_dir, 'static', BUILD_DIR)
+    os.makedirs(asset_dir, exist_ok=True)
+    wanted = set()
+    for path in load_assets()['files'].values():
+        for suffix in ('', '.gz', '.br'):
+            source = os.path.join(app.static_folder, path + suffix)
+            if os.path.exists(source):
+                wanted.add(os.path.basename(source))
+
+    copied = 0
+    for filename in os.listdir(asset_dir):
+        if filename not in wanted:
+            os.remove(os.path.join(asset_dir, filename))
+    for filename in wanted:
+        target = os.path.join(asset_dir, filename)
+        if not os.path.exists(target):
+            shutil.copyfile(os.path.join(app.static_folder, BUILD_DIR, filename), target)
+            copied += 1
+    return copied + copy_images(out_dir)
+
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def remove_page(out_dir, rel_path):
+    for suffix in ('', '.gz', '.br'):
+        try:
+            os.remove(os.path.join(out_dir, rel_path + suffix))
+        except FileNotFoundError:
+            pass
+
+def export_site(out_dir=DEFAULT_OUT_DIR, workers=None, base_url='http://localhost/', force=False):
+    """Export all pages to ``out_dir`` and return a summary dict."""
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+
+    # An export renders one fixed dataset; don't hot reload mid-run
+    reloader.interval = 0
+    reloader.stop()
+    # Static files can't vary by query string, so each city is one whole page
+    app.config['CITY_PAGE_SIZE'] = 0
+    # There's no /img route in a static export, so pages link the original photos
+    app.config['IMAGE_PROXY'] = False
+    create_app(preload=True)
+
+    manifest = {} if force else load_manifest(out_dir)
+    # Pool workers are forked after planning, so they render this same dataset
+    pages = plan_pages(current_dataset(), base_url)
+    current_urls = {url for url, _, _ in pages}
+
+    tasks = []
+    new_manifest = {}
+    for url, rel_path, fingerprint in pages:
+        entry = manifest.get(url)
+        if (entry and entry['inputs'] == fingerprint and entry['path'] == rel_path
+                and os.path.exists(os.path.join(out_dir, rel_path))):
+            new_manifest[url] = entry
+            continue
+        tasks.append((url, rel_path, out_dir, base_url, entry['sha256'] if entry else None))
+        new_manifest[url] = {'path': rel_path, 'inputs': fingerprint, 'sha256': None}
+
+    written = 0
+    if tasks:
+        # fork shares the already-loaded app and dataset with the workers
+        context = multiprocessing.get_context('fork')
+        with context.Pool(processes=workers) as pool:
+            for url, content_sha, was_written in pool.imap_unordered(render_page, tasks, chunksize=8):
+                new_manifest[url]['sha256'] = content_sha
+                written += was_written
+
+    removed = 0
+    for url, entry in manifest.items():
+        if url not in current_urls:
+            remove_page(out_dir, entry['path'])
+            removed += 1
+    assets = copy_assets(out_dir)
+
+    _write_atomic(os.path.join(out_dir, MANIFEST_NAME),
+                  json.dumps(new_manifest, indent=1, sort_keys=True).encode('utf-8'))
+
+    return {
+        'pages': len(pages),
+        'rendered': len(tasks),
+        'written': written,
+        'removed': removed,
+        'assets': assets,
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the directory as static HTML.')
+    parser.add_argument('--out', default=DEFAULT_OUT_DIR, help='Output directory')
+    parser.add_argument('--workers', type=int, default=None, help='Render processes (default: CPU count)')
+    parser.add_argument('--base-url', default='http://localhost/',
+                        help='Public site URL used for absolute links in sitemap.xml')
+    parser.add_argument('--force', action='store_true', help='Re-render every page')
+    args = parser.parse_args()
+
+    summary = export_site(args.out, workers=args.workers, base_url=args.base_url, force=args.force)
+    print(f"Exported {summary['pages']} pages to {args.out}: {summary['rendered']} rendered, "
+          f"{summary['written']} written, {summary['removed']} removed, {summary['assets']} asset files copied "
+          f"in {summary['seconds']}s")
@@ -0,0 +1,237 @@
+"""Offline geocoding of cities and a grid index for distance queries.
+
+Cities are placed with a local gazetteer file; the listings have no
+coordinates of their own, so each store is located at its city. Two
+layouts are read:
+
+* the US Census Gazetteer places file (tab-separated ``USPS``, ``NAME``,
+  ``INTPTLAT``, ``INTPTLONG`` columns, names like "Springfield city"), or
+* a CSV with ``state``, ``city``, ``latitude`` and ``longitude`` columns,
+  where ``state`` is a full name or a postal abbreviation.
+
+``GeoIndex`` buckets city coordinates into a fixed latitude/longitude grid
+held as sorted NumPy arrays. A radius query looks up only the cells that
+overlap the search circle and computes their haversine distances in one
+vectorized pass, so queries stay sub-millisecond with every US city loaded.
+"""
+import logging
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180
+
+STATE_ABBREVIATIONS = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California',
+    'CO': 'Colorado', 'CT': 'Connecticut', 'DE': 'Delaware', 'DC': 'District of Columbia',
+    'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho', 'IL': 'Illinois',
+    'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada',
+    'NH': 'New Hampshire', 'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York',
+    'NC': 'North Carolina', 'ND': 'North Dakota', 'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon',
+    'PA': 'Pennsylvania', 'PR': 'Puerto Rico', 'RI': 'Rhode Island', 'SC': 'South Carolina',
+    'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
+
+# Census place names end in their legal type, e.g. "Salem city", "Aurora CDP"
+PLACE_SUFFIX_RE = re.compile(r'\s+(city and borough|consolidated government|metropolitan government|'
+                             r'unified government|municipality|borough|city|town|township|village|'
+                             r'CDP|comunidad|zona urbana)(\s+\(balance\))?$', re.IGNORECASE)
+ABBREVIATIONS = {'st': 'saint', 'ste': 'sainte', 'ft': 'fort', 'mt': 'mount'}
+WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def place_key(state_name, city_name):
+    """Normalized ``(state, city)`` key so "St. Louis" and "Saint Louis" match."""
+    words = WORD_RE.findall(str(city_name).lower().replace("'", ''))
+    return str(state_name).strip().lower(), ' '.join(ABBREVIATIONS.get(word, word) for word in words)
+
+def _column(df, *names):
+    columns = {col.strip().lower(): col for col in df.columns}
+    for name in names:
+        if name in columns:
+            return df[columns[name]]
+    raise ValueError(f"Gazetteer has no {names[0]} column")
+
+def load_gazetteer(path):
+    """Return ``{place_key: (latitude, longitude)}`` from a gazetteer file.
+
+    Returns an empty dict when the file does not exist.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+
+    with open(path, encoding='utf-8-sig') as f:
+        header = f.readline()
+    df = pd.read_csv(path, sep='\t' if '\t' in header else ',', dtype=str, encoding='utf-8-sig')
+    states = _column(df, 'state', 'usps').str.strip()
+    states = states.map(lambda value: STATE_ABBREVIATIONS.get(value.upper(), value))
+    cities = _column(df, 'city', 'name').str.strip().str.replace(PLACE_SUFFIX_RE, '', regex=True)
+    latitudes = pd.to_numeric(_column(df, 'latitude', 'lat', 'intptlat'), errors='coerce')
+    longitudes = pd.to_numeric(_column(df, 'longitude', 'lon', 'lng', 'intptlong'), errors='coerce')
+
+    gazetteer = {}
+    for state_name, city_name, lat, lon in zip(states, cities, latitudes, longitudes):
+        if pd.isna(lat) or pd.isna(lon) or pd.isna(state_name) or pd.isna(city_name):
+            continue
+        # The first entry wins; Census files list incorporated places first
+        gazetteer.setdefault(place_key(state_name, city_name), (float(lat), float(lon)))
+
+    logger.info(f"Loaded {len(gazetteer)} places from gazetteer {path}")
+    return gazetteer
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """Great-circle distances in km from one point to arrays of points (all in degrees)."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class GeoIndex:
+    """Cities of one dataset on a latitude/longitude grid.
+
+    ``places`` is a list of ``(state_data, city)`` pairs aligned with the
+    ``latitudes`` and ``longitudes`` arrays. Points are sorted by grid cell
+    so each cell is a contiguous slice found with ``searchsorted``.
+    """
+
+    def __init__(self, places, latitudes, longitudes, cell_degrees=0.5):
+        self.cell_degrees = cell_degrees
+        self.lon_cells = int(round(360 / cell_degrees))
+        self.lat_cells = int(round(180 / cell_degrees))
+
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        cells = self._cells(latitudes, longitudes)
+        order = np.argsort(cells, kind='stable')
+
+        self.places = [places[i] for i in order]
+        self.latitudes = latitudes[order]
+        self.longitudes = longitudes[order]
+        self.cells = cells[order]
+        self.positions = {(state_data.name, city.name): i
+                          for i, (state_data, city) in enumerate(self.places)}
+        # Small integer per state, so queries can filter by state in NumPy
+        self.state_codes = {}
+        self.states = np.array([self.state_codes.setdefault(state_data.name, len(self.state_codes))
+                                for state_data, _ in self.places], dtype=np.int64)
+
+    @classmethod
+    def build(cls, processed_data, gazetteer, cell_degrees=0.5):
+        """Geocode every city in ``processed_data`` that the gazetteer knows."""
+        places, latitudes, longitudes = [], [], []
+        missing = 0
+        for state_data in processed_data.values():
+            for city in state_data.cities:
+                location = gazetteer.get(place_key(state_data.name, city.name))
+                if location is None:
+                    missing += 1
+                    continue
+                places.append((state_data, city))
+                latitudes.append(location[0])
+                longitudes.append(location[1])
+        if missing and gazetteer:
+            logger.info(f"{missing} cities are not in the gazetteer and have no location")
+        return cls(places, latitudes, longitudes, cell_degrees)
+
+    def __len__(self):
+        return len(self.places)
+
+    def _cells(self, latitudes, longitudes):
+        lat_cells = np.clip(((latitudes + 90) // self.cell_degrees).astype(np.int64), 0, self.lat_cells - 1)
+        lon_cells = ((longitudes + 180) // self.cell_degrees).astype(np.int64) % self.lon_cells
+        return lat_cells * self.lon_cells + lon_cells
+
+    def location(self, state_name, city_name):
+        """Return a city's ``(latitude, longitude)``, or None if it wasn't geocoded."""
+        position = self.positions.get((state_name, city_name))
+        if position is None:
+            return None
+        return float(self.latitudes[position]), float(self.longitudes[position])
+
+    def _candidates(self, lat, lon, radius_km):
+        """Positions of points in grid cells overlapping the search circle."""
+        lat_span = radius_km / KM_PER_DEGREE
+        lat_low = max(lat - lat_span, -90.0)
+        lat_high = min(lat + lat_span, 90.0)
+        lat_range = np.arange(int((lat_low + 90) // self.cell_degrees),
+                              min(int((lat_high + 90) // self.cell_degrees), self.lat_cells - 1) + 1)
+
+        # Longitude degrees shrink toward the poles; use the widest latitude
+        cos_lat = np.cos(np.radians(max(abs(lat_low), abs(lat_high))))
+        if cos_lat <= 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            lon_range = np.arange(self.lon_cells)
+        else:
+            lon_span = radius_km / (KM_PER_DEGREE * cos_lat)
+            first = int((lon - lon_span + 180) // self.cell_degrees)
+            last = int((lon + lon_span + 180) // self.cell_degrees)
+            lon_range = np.arange(first, last + 1) % self.lon_cells
+
+        wanted = (lat_range[:, None] * self.lon_cells + lon_range[None, :]).ravel()
+        starts = np.searchsorted(self.cells, wanted, side='left')
+        ends = np.searchsorted(self.cells, wanted, side='right')
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        # Concatenated start:end ranges: each run counts up from its cell's start
+        return np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """Return ``(places, total)`` for the cities within ``radius_km``.
+
+        ``places`` are up to ``limit`` ``(state_data, city, distance_km)``,
+        nearest first; ``total`` counts every city inside the radius.
+        """
+        if not self.places:
+            return [], 0
+        candidates = self._candidates(lat, lon, radius_km)
+        if not len(candidates):
+            return [], 0
+
+        distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        inside = distances <= radius_km
+        candidates, distances = candidates[inside], distances[inside]
+        total = len(candidates)
+        if limit is not None and total > limit:
+            nearest = np.argpartition(distances, limit - 1)[:limit]
+            candidates, distances = candidates[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return [(*self.places[candidates[i]], float(distances[i])) for i in order], total
+
+    def neighbours(self, state_name, count, chunk_size=512):
+        """Map each located city in a state to its ``count`` nearest located cities there.
+
+        A state has at most a few thousand cities, so distances between all
+        of them are computed as a dense matrix ``chunk_size`` rows at a time;
+        one vectorized pass per state beats a grid query per city.
+        """
+        state_code = self.state_codes.get(state_name)
+        if state_code is None:
+            return {}
+        positions = np.flatnonzero(self.states == state_code)
+        count = max(0, min(count, len(positions) - 1))
+        if count == 0:
+            return {}
+
+        latitudes, longitudes = self.latitudes[positions], self.longitudes[positions]
+        neighbours = {}
+        for start in range(0, len(positions), chunk_size):
+            end = min(start + chunk_size, len(positions))
+            distances = haversine_km(latitudes[start:end, None], longitudes[start:end, None],
+                                     latitudes[None, :], longitudes[None, :])
+            distances[np.arange(end - start), np.arange(start, end)] = np.inf
+            nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            order = np.argsort(np.take_along_axis(distances, nearest, axis=1), axis=1, kind='stable')
+            for row, columns in enumerate(np.take_along_axis(nearest, order, axis=1), start):
+                city = self.places[positions[row]][1]
+                neighbours[city.name] = [self.places[positions[column]][1] for column in columns]
+        return neighbours
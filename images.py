@@ -0,0 +1,393 @@
+"""Store photo thumbnails: fetch, validate, resize to WebP and cache on disk.
+
+Pages link photos as ``/img/<key>``, where the key is a hash of the photo
+URL and thumbnail size, instead of hot-linking the full-size original.
+Rendering a page registers each key and queues its thumbnail on a
+background thread pool, so most are ready before the browser asks; the
+route waits for the queued job otherwise. Photos that can't be fetched
+or decoded are remembered for a while and answered with the default store
+image, so broken URLs don't cost a round trip on every view.
+
+The disk cache keeps one small source record per key (the URL and size,
+so any worker process can serve any key) and the WebP thumbnails,
+evicting the least recently used keys, with all their files, beyond a
+byte budget. Rendering re-registers a key whose record was evicted.
+
+Photos come from a pluggable source: ``HTTPSource`` fetches them, and
+``DirectorySource`` reads files named after the URL's last path segment
+from a local directory, for development and benchmarks without network.
+
+Resizing needs Pillow with WebP support; without it the app keeps linking
+the original URLs. Pillow and urllib.request are imported on first use to
+keep importing the app fast.
+"""
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from urllib.parse import urlparse
+
+HAS_PILLOW = importlib.util.find_spec('PIL') is not None
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail name -> (max width, max height). Photos keep their aspect ratio
+# and are never enlarged; the card crops them with object-fit: cover.
+SIZES = {
+    'card': (480, 480),
+    'card-2x': (960, 960)
+}
+# Bump when the output for the same input changes, so old thumbnails are refetched
+PIPELINE_VERSION = 1
+
+ALLOWED_FORMATS = {'JPEG', 'PNG', 'GIF', 'WEBP'}
+MAX_PIXELS = 40_000_000
+WEBP_QUALITY = 80
+
+
+class ImageError(Exception):
+    """A photo could not be fetched or is not a usable image."""
+
+
+def image_key(url, size):
+    """Cache key for one thumbnail size of a photo URL."""
+    return hashlib.sha256(f'{PIPELINE_VERSION}:{size}:{url}'.encode('utf-8')).hexdigest()[:32]
+
+def is_image_key(key):
+    return len(key) == 32 and all(c in '0123456789abcdef' for c in key)
+
+def webp_supported():
+    """Whether Pillow is installed with WebP support."""
+    if not HAS_PILLOW:
+        return False
+    from PIL import features
+    return features.check('webp')
+
+
+class HTTPSource:
+    """Fetch photos over HTTP(S), refusing anything larger than ``max_bytes``."""
+
+    def __init__(self, timeout=10, max_bytes=10 * 1024 * 1024, user_agent='ConsignmentStoreDirectory/1.0'):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.user_agent = user_agent
+
+    def fetch(self, url):
+        import urllib.error
+        import urllib.request
+        if urlparse(url).scheme not in ('http', 'https'):
+            raise ImageError(f"Unsupported photo URL: {url}")
+        request = urllib.request.Request(url, headers={'User-Agent': self.user_agent, 'Accept': 'image/*'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                length = response.headers.get('Content-Length')
+                if length and length.isdigit() and int(length) > self.max_bytes:
+                    raise ImageError(f"Photo is {length} bytes: {url}")
+                data = response.read(self.max_bytes + 1)
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            raise ImageError(f"Fetching {url} failed: {e}") from e
+        if len(data) > self.max_bytes:
+            raise ImageError(f"Photo exceeds {self.max_bytes} bytes: {url}")
+        return data
+
+class DirectorySource:
+    """Read photos from ``directory``, by the last path segment of their URL."""
+
+    def __init__(self, directory, max_bytes=10 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def fetch(self, url):
+        name = os.path.basename(urlparse(url).path)
+        path = os.path.join(self.directory, name)
+        if not name or not os.path.isfile(path):
+            raise ImageError(f"No local photo for {url}")
+        if os.path.getsize(path) > self.max_bytes:
+            raise ImageError(f"Photo exceeds {self.max_bytes} bytes: {path}")
+        with open(path, 'rb') as f:
+            return f.read()
+
+
+def make_thumbnails(data, sizes, quality=WEBP_QUALITY):
+    """Validate image bytes once and return ``{name: WebP}`` for each ``{name: size}``."""
+    from PIL import Image, ImageOps
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format not in ALLOWED_FORMATS:
+            raise ImageError(f"Unsupported image format {image.format}")
+        if image.width * image.height > MAX_PIXELS:
+            raise ImageError(f"Image is too large: {image.width}x{image.height}")
+        # Lets JPEG decode at a reduced scale instead of full size
+        image.draft('RGB', (max(w for w, _ in sizes.values()), max(h for _, h in sizes.values())))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        thumbnails = {}
+        for name, size in sizes.items():
+            thumbnail = image.copy()
+            thumbnail.thumbnail(size, Image.LANCZOS)
+            out = io.BytesIO()
+            thumbnail.save(out, 'WEBP', quality=quality, method=4)
+            thumbnails[name] = out.getvalue()
+        return thumbnails
+    except ImageError:
+        raise
+    except Exception as e:
+        raise ImageError(f"Invalid image: {e}") from e
+
+def make_thumbnail(data, size, quality=WEBP_QUALITY):
+    """Validate image bytes and return a WebP scaled to fit ``size``."""
+    return make_thumbnails(data, {'thumbnail': size}, quality)['thumbnail']
+
+
+class ThumbnailCache:
+    """WebP thumbnails on disk with least-recently-used eviction.
+
+    ``directory/<k0k1>/<key>.webp`` holds a thumbnail, ``<key>.json`` its
+    source record and ``<key>.err`` a recent failure. All three count
+    towards ``max_bytes`` and are evicted together, so records of photos
+    that are no longer shown don't pile up. Each process tracks recency in
+    memory, seeded from file modification times, and touches files it
+    serves so other processes see them as recent when they start.
+    """
+
+    # Per-key byte counts are kept in this order
+    EXTENSIONS = ('.webp', '.json', '.err')
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f'{key}{extension}')
+
+    def _scan(self):
+        found = {}
+        if os.path.isdir(self.directory):
+            for shard in os.listdir(self.directory):
+                shard_dir = os.path.join(self.directory, shard)
+                if not os.path.isdir(shard_dir):
+                    continue
+                for name in os.listdir(shard_dir):
+                    key, extension = os.path.splitext(name)
+                    if extension not in self.EXTENSIONS:
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(shard_dir, name))
+                    except OSError:
+                        continue
+                    entry = found.setdefault(key, [0.0, [0, 0, 0]])
+                    entry[0] = max(entry[0], stat.st_mtime)
+                    entry[1][self.EXTENSIONS.index(extension)] = stat.st_size
+        for key, (_, sizes) in sorted(found.items(), key=lambda item: item[1][0]):
+            self._entries[key] = sizes
+            self.size += sum(sizes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _record(self, key, extension, size):
+        """Set the byte count of one file of ``key`` and evict to fit; call with the lock held.
+
+        Returns the keys evicted, whose files the caller removes.
+        """
+        sizes = self._entries.pop(key, None) or [0, 0, 0]
+        index = self.EXTENSIONS.index(extension)
+        self.size += size - sizes[index]
+        sizes[index] = size
+        self._entries[key] = sizes
+        evicted = []
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            old_key, old_sizes = self._entries.popitem(last=False)
+            self.size -= sum(old_sizes)
+            evicted.append(old_key)
+        return evicted
+
+    def _remove(self, keys):
+        for key in keys:
+            for extension in self.EXTENSIONS:
+                try:
+                    os.remove(self._path(key, extension))
+                except OSError:
+                    pass
+
+    def _write(self, key, extension, data):
+        path = self._path(key, extension)
+        _write_atomic(path, data)
+        with self._lock:
+            evicted = self._record(key, extension, len(data))
+        self._remove(evicted)
+        return path
+
+    def get(self, key):
+        """Return the thumbnail path for ``key``, or None if it isn't cached."""
+        path = self._path(key, '.webp')
+        with self._lock:
+            sizes = self._entries.get(key)
+            if sizes is not None:
+                self._entries.move_to_end(key)
+        try:
+            os.utime(path)
+        except OSError:
+            if sizes is not None and sizes[0]:
+                # Evicted by another process
+                with self._lock:
+                    self.size -= sum(self._entries.pop(key, (0,)))
+            return None
+        if sizes is None or not sizes[0]:
+            # Written by another process
+            with self._lock:
+                evicted = self._record(key, '.webp', os.path.getsize(path))
+            self._remove(evicted)
+        return path
+
+    def put(self, key, data):
+        """Store a thumbnail and return its path, evicting old entries to fit."""
+        return self._write(key, '.webp', data)
+
+    def source(self, key):
+        """Return the ``(url, size)`` registered for ``key``, or None."""
+        try:
+            with open(self._path(key, '.json')) as f:
+                record = json.load(f)
+            return record['url'], record['size']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def register(self, key, url, size):
+        """Record the source of ``key``; returns True if it wasn't recorded already."""
+        if os.path.exists(self._path(key, '.json')):
+            return False
+        self._write(key, '.json', json.dumps({'url': url, 'size': size}).encode('utf-8'))
+        return True
+
+    def failed(self, key, ttl):
+        """Whether ``key`` failed within the last ``ttl`` seconds."""
+        try:
+            return time.time() - os.path.getmtime(self._path(key, '.err')) < ttl
+        except OSError:
+            return False
+
+    def mark_failed(self, key, reason):
+        self._write(key, '.err', reason.encode('utf-8'))
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class ThumbnailService:
+    """Turns photo URLs into thumbnail keys and produces them in the background.
+
+    Jobs are per photo URL, not per key: one fetch and decode writes every
+    size in ``SIZES``, and a failure is logged and marked once for all.
+    """
+
+    def __init__(self, cache, source, workers=4, failure_ttl=24 * 3600, known_keys=100_000):
+        self.cache = cache
+        self.source = source
+        self.workers = workers
+        self.failure_ttl = failure_ttl
+        self.known_keys = known_keys
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self._known = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+
+    def key(self, url, size):
+        """Register ``url`` at ``size`` and return its key, queueing the thumbnail."""
+        key = image_key(url, size)
+        with self._lock:
+            known = key in self._known
+            if known:
+                self._known.move_to_end(key)
+            else:
+                self._known[key] = True
+                if len(self._known) > self.known_keys:
+                    self._known.popitem(last=False)
+        try:
+            # The record may have been evicted since, here or by another process
+            registered = self.cache.register(key, url, size)
+            if known and not registered:
+                return key
+            if self.cache.get(key) is None and not self.cache.failed(key, self.failure_ttl):
+                self._submit(url)
+        except Exception as e:
+            logger.error(f"Error registering photo {url}: {e}")
+        return key
+
+    def _pool(self):
+        # Threads don't survive fork, so each worker process starts its own pool
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='thumbnails')
+            self._pid = os.getpid()
+            self._pending = {}
+        return self._executor
+
+    def _submit(self, url):
+        with self._lock:
+            future = self._pending.get(url)
+            if future is None:
+                future = self._pool().submit(self._process, url)
+                self._pending[url] = future
+                future.add_done_callback(lambda _: self._pending.pop(url, None))
+            return future
+
+    def _process(self, url):
+        keys = {size: image_key(url, size) for size in SIZES}
+        missing = {size: SIZES[size] for size, key in keys.items() if self.cache.get(key) is None}
+        if not missing:
+            return
+        try:
+            thumbnails = make_thumbnails(self.source.fetch(url), missing)
+        except ImageError as e:
+            self.failures += 1
+            logger.warning(f"Photo {url} is unavailable: {e}")
+            for key in keys.values():
+                self.cache.mark_failed(key, str(e))
+            return
+        for size, data in thumbnails.items():
+            self.cache.put(keys[size], data)
+
+    def get(self, key, timeout=10):
+        """Return the thumbnail path for ``key``, producing it if needed.
+
+        Returns None for unknown keys and for photos that failed recently
+        or did not finish within ``timeout`` seconds.
+        """
+        path = self.cache.get(key)
+        if path is not None:
+            self.hits += 1
+            return path
+        self.misses += 1
+        record = self.cache.source(key)
+        if record is None or record[1] not in SIZES or self.cache.failed(key, self.failure_ttl):
+            return None
+        try:
+            self._submit(record[0]).result(timeout=timeout)
+            return self.cache.get(key)
+        except FutureTimeoutError:
+            # Still being fetched; the job carries on in the background
+            return None
+        except Exception as e:
+            logger.error(f"Error producing thumbnail {key}: {e}")
+            return None
@@ -0,0 +1,187 @@
+"""Diff-based incremental updates between dataset versions.
+
+``diff_stores`` compares two cleaned DataFrames by a stable store key and
+reports which cities actually changed, so a reload can rebuild only those
+cities and their states instead of regrouping every row. ``ChangeSet``
+describes the result for downstream consumers: the page cache keeps pages
+outside it, and it is written next to the snapshot as JSON for external
+caches and the static exporter.
+"""
+import json
+import os
+
+import pandas as pd
+
+from records import STORE_FIELDS
+
+# Columns identifying a store across versions; a store that moves city is
+# seen as removed from one city and added to another
+STORE_KEY_COLUMNS = ['state', 'city', 'name', 'address']
+
+# Above this fraction of changed stores a full rebuild is cheaper
+MAX_INCREMENTAL_FRACTION = 0.2
+
+
+def _is_name(value):
+    return bool(value) and not pd.isna(value)
+
+def store_hashes(df):
+    """Return a Series of per-store content hashes indexed by stable store key.
+
+    The key is a hash of ``STORE_KEY_COLUMNS`` plus an occurrence number, so
+    duplicate listings of the same store stay distinct.
+    """
+    keys = pd.util.hash_pandas_object(df[STORE_KEY_COLUMNS], index=False).to_numpy()
+    occurrence = pd.Series(keys).groupby(keys).cumcount().to_numpy()
+    columns = [col for col in STORE_FIELDS if col in df.columns]
+    content = pd.util.hash_pandas_object(df[columns], index=False).to_numpy()
+    index = pd.MultiIndex.from_arrays([keys, occurrence], names=['key', 'occurrence'])
+    return pd.Series(content, index=index)
+
+
+class StoreDiff:
+    """Stores added, removed and changed between two DataFrames."""
+
+    __slots__ = ('added', 'removed', 'changed', 'total', 'affected_cities')
+
+    def __init__(self, added, removed, changed, total, affected_cities):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.total = total
+        self.affected_cities = affected_cities
+
+    @property
+    def affected_states(self):
+        return {state_name for state_name, _ in self.affected_cities}
+
+    @property
+    def changed_fraction(self):
+        return (self.added + self.removed + self.changed) / max(self.total, 1)
+
+    def __repr__(self):
+        return (f"StoreDiff(added={self.added}, removed={self.removed}, changed={self.changed}, "
+                f"cities={len(self.affected_cities)})")
+
+
+def diff_stores(old_df, new_df):
+    """Diff two cleaned store DataFrames by stable store key."""
+    old = store_hashes(old_df)
+    new = store_hashes(new_df)
+
+    removed = ~old.index.isin(new.index)
+    added = ~new.index.isin(old.index)
+    common = old.index[~removed]
+    changed_keys = common[old[common].to_numpy() != new[common].to_numpy()]
+    changed_old = old.index.isin(changed_keys)
+    changed_new = new.index.isin(changed_keys)
+
+    affected = set()
+    for df, mask in ((old_df, removed | changed_old), (new_df, added | changed_new)):
+        rows = df.loc[mask, ['state', 'city']]
+        affected.update(
+            (state_name, city_name)
+            for state_name, city_name in rows.drop_duplicates().itertuples(index=False, name=None)
+            if _is_name(state_name) and _is_name(city_name)
+        )
+
+    return StoreDiff(int(added.sum()), int(removed.sum()), len(changed_keys), len(new_df),
+                     frozenset(affected))
+
+
+def _global_context(summary):
+    """The summary values shown on every page, as comparable plain data."""
+    return (
+        summary.total_stores, summary.total_cities, summary.total_states,
+        tuple(summary.state_counts.items()), summary.popular_states,
+        tuple(tuple(city.items()) for city in summary.popular_cities),
+        tuple((state.name, state.slug, state.store_count) for state in summary.suggested_states),
+        tuple(tuple(city.items()) for city in summary.suggested_cities)
+    )
+
+def _state_paths(state_data):
+    paths = {f'/state/{state_data.slug}', f'/api/v1/states/{state_data.slug}/cities'}
+    for city in state_data.cities:
+        paths.add(f'/state/{state_data.slug}/{city.slug}')
+        paths.add(f'/state/{state_data.slug}/{city.slug}/stores')
+        paths.add(f'/api/v1/states/{state_data.slug}/cities/{city.slug}/stores')
+    return paths
+
+
+class ChangeSet:
+    """Pages affected by moving from one dataset version to the next.
+
+    When ``global_changed`` is set, values rendered on every page (totals,
+    navigation counts, popular lists) or the gazetteer changed, so every
+    page is invalid.
+    Otherwise only ``paths`` are.
+    """
+
+    __slots__ = ('from_version', 'to_version', 'incremental', 'affected_states',
+                 'affected_cities', 'global_changed', 'paths')
+
+    def __init__(self, from_version, to_version, incremental, affected_states, affected_cities,
+                 global_changed, paths):
+        self.from_version = from_version
+        self.to_version = to_version
+        self.incremental = incremental
+        self.affected_states = frozenset(affected_states)
+        self.affected_cities = frozenset(affected_cities)
+        self.global_changed = global_changed
+        self.paths = frozenset(paths)
+
+    @classmethod
+    def between(cls, previous, current, diff=None):
+        """Build the change set from ``previous`` to ``current`` Dataset."""
+        if diff is None:
+            # Without a diff every state is treated as changed
+            affected_cities = set()
+            affected_states = set(previous.processed_data) | set(current.processed_data)
+            global_changed = True
+        else:
+            affected_cities = diff.affected_cities
+            affected_states = diff.affected_states
+            # The gazetteer decides the nearby cities on every city page
+            global_changed = (_global_context(previous.summary) != _global_context(current.summary) or
+                              previous.gazetteer_version != current.gazetteer_version)
+
+        # A changed city alters its state page and, through the city list and
+        # nearby cities, every city page in that state, under old and new slugs
+        paths = {'/', '/sitemap', '/sitemap.xml', '/api/v1/states'}
+        paths.update(f'/sitemaps/sitemap-{shard}.xml.gz'
+                     for shard in range(max(previous.sitemap_builder.shard_count,
+                                            current.sitemap_builder.shard_count)))
+        for processed_data in (previous.processed_data, current.processed_data):
+            for state_name in affected_states:
+                if state_name in processed_data:
+                    paths.update(_state_paths(processed_data[state_name]))
+
+        return cls(previous.version, current.version, diff is not None, affected_states,
+                   affected_cities, global_changed, paths)
+
+    def invalidates(self, path):
+        return self.global_changed or path in self.paths
+
+    def to_dict(self):
+        return {
+            'from_version': self.from_version,
+            'to_version': self.to_version,
+            'incremental': self.incremental,
+            'global_changed': self.global_changed,
+            'affected_states': sorted(self.affected_states),
+            'affected_cities': sorted(f'{state_name}/{city_name}'
+                                      for state_name, city_name in self.affected_cities),
+            'paths': sorted(self.paths)
+        }
+
+    def write(self, path):
+        """Atomically write the change set as JSON."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+        os.replace(tmp_path, path)
+
+    def __repr__(self):
+        return (f"ChangeSet({self.from_version!r} -> {self.to_version!r}, "
+                f"states={len(self.affected_states)}, global={self.global_changed})")
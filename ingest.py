@@ -0,0 +1,343 @@
+"""Ingest the store spreadsheet into a cleaned, versioned snapshot.
+
+The Excel source is slow to parse, so it is read and cleaned once and
+written as a columnar snapshot (an uncompressed Arrow IPC file when pyarrow
+is installed, a pandas pickle otherwise). Workers load the snapshot and only
+rebuild it when the source file's mtime/size and content hash no longer
+match. The Arrow file can also be memory-mapped and shared read-only between
+worker processes (see store_table.py).
+
+Usage:
+    python ingest.py [--force]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from snapshot import (HAS_PYARROW, SNAPSHOT_FORMAT, SNAPSHOT_VERSION, DATA_FILE, SNAPSHOT_DIR,
+                      snapshot_paths, read_snapshot_meta)
+
+# Arrow-backed strings run the cleaning string ops in C++ instead of a
+# per-row Python loop; without pyarrow the same ops run on object dtype.
+TEXT_DTYPE = 'string[pyarrow]' if HAS_PYARROW else object
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_COLUMNS = [
+    'Business Name', 'Address', 'City', 'State',
+    'Number of Reviews', 'New SEO Description V2',
+    'Site', 'Phone', 'Photo'
+]
+
+COLUMN_NAMES = {
+    'Business Name': 'name',
+    'Address': 'address',
+    'City': 'city',
+    'State': 'state',
+    'Number of Reviews': 'review_count',
+    'New SEO Description V2': 'description',
+    'Site': 'website',
+    'Phone': 'phone',
+    'Photo': 'photo'
+}
+
+STRING_COLUMNS = ['name', 'address', 'city', 'state', 'website', 'phone']
+
+# Rows cleaned per chunk; bounds the size of intermediate copies
+CLEAN_CHUNK_SIZE = 100_000
+
+# Everything str.isspace() accepts. Spelled out so Arrow's trim and regex
+# engine (whose defaults are ASCII-only) match Python's str.strip().
+WHITESPACE = ('\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680'
+              '\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a'
+              '\u2028\u2029\u202f\u205f\u3000')
+PARAGRAPH_BREAK_RE = f'[{WHITESPACE}]*\n\n[{WHITESPACE}]*'
+
+
+def validate_photo_url(url):
+    """Validate and clean photo URLs."""
+    if pd.isna(url) or not url:
+        return ''
+
+    url = str(url).strip()
+    url = url.replace(' ', '%20')
+
+    if url and not url.startswith(('http://', 'https://')):
+        url = 'https://' + url
+
+    return url
+
+def format_description(description):
+    """Format store description into paragraphs."""
+    if pd.isna(description) or not description:
+        return ''
+
+    description = str(description).strip()
+    paragraphs = [p.strip() for p in description.split('\n\n')]
+    return '\n\n'.join(p for p in paragraphs if p)
+
+
+def read_source(file_path):
+    """Read the raw spreadsheet and check that the required columns exist."""
+    df = pd.read_excel(file_path)
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise ValueError(f"Missing required columns: {missing_columns}")
+
+    return df
+
+@contextmanager
+def stage_timer(timings, stage):
+    """Accumulate the wall time of a pipeline stage into ``timings``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+def _is_blank(series):
+    """Vectorized ``pd.isna(value) or not value``."""
+    values = series.to_numpy()
+    blank = pd.isna(values)
+    present = ~blank
+    blank[present] = ~values[present].astype(bool)
+    return pd.Series(blank, index=series.index)
+
+def clean_photo_urls(series):
+    """Vectorized equivalent of ``series.apply(validate_photo_url)``."""
+    result = pd.Series('', index=series.index, dtype=object)
+    present = ~_is_blank(series)
+    if not present.any():
+        return result
+
+    urls = series[present].astype(str).astype(TEXT_DTYPE).str.strip(WHITESPACE)
+    urls = urls.str.replace(' ', '%20', regex=False)
+    needs_scheme = (urls != '') & ~urls.str.startswith('http://') & ~urls.str.startswith('https://')
+    urls[needs_scheme] = 'https://' + urls[needs_scheme]
+
+    result[present] = urls.astype(object)
+    return result
+
+def clean_descriptions(series):
+    """Vectorized equivalent of ``series.apply(format_description)``.
+
+    Splitting on blank lines, stripping each paragraph and dropping empty
+    ones is the same as collapsing every whitespace run that contains a
+    blank line into exactly one blank line.
+    """
+    result = pd.Series('', index=series.index, dtype=object)
+    present = ~_is_blank(series)
+    if not present.any():
+        return result
+
+    text = series[present].astype(str).astype(TEXT_DTYPE).str.strip(WHITESPACE)
+    # The regex is the expensive step, so only run it where it can match
+    multi_paragraph = text.str.contains('\n\n', regex=False)
+    if multi_paragraph.any():
+        text[multi_paragraph] = text[multi_paragraph].str.replace(PARAGRAPH_BREAK_RE, '\n\n', regex=True)
+
+    result[present] = text.astype(object)
+    return result
+
+def clean_chunk(chunk, timings):
+    """Clean one chunk of renamed spreadsheet rows in place."""
+    with stage_timer(timings, 'review_count'):
+        # Convert review count to numeric, replacing NaN with 0
+        chunk['review_count'] = pd.to_numeric(chunk['review_count'], errors='coerce').fillna(0).astype(int)
+
+    with stage_timer(timings, 'strings'):
+        for col in STRING_COLUMNS:
+            text = chunk[col].fillna('').astype(str).astype(TEXT_DTYPE)
+            chunk[col] = text.str.strip(WHITESPACE).astype(object)
+
+    with stage_timer(timings, 'description'):
+        chunk['description'] = clean_descriptions(chunk['description'])
+
+    with stage_timer(timings, 'photo'):
+        chunk['photo'] = clean_photo_urls(chunk['photo'])
+
+    return chunk
+
+def clean_dataframe(df, chunk_size=CLEAN_CHUNK_SIZE, timings=None):
+    """Rename, type and clean the raw spreadsheet columns.
+
+    Rows are cleaned in chunks of ``chunk_size`` with vectorized string
+    operations. Per-stage durations in seconds are accumulated into
+    ``timings`` when a dict is passed.
+    """
+    if timings is None:
+        timings = {}
+
+    with stage_timer(timings, 'rename'):
+        df = df.rename(columns=COLUMN_NAMES)
+
+    chunks = []
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size].copy()
+        chunks.append(clean_chunk(chunk, timings))
+
+    with stage_timer(timings, 'concat'):
+        if len(chunks) > 1:
+            df = pd.concat(chunks)
+        elif chunks:
+            df = chunks[0]
+        else:
+            df = clean_chunk(df.copy(), timings)
+
+    # Add hours column if it doesn't exist
+    if 'hours' not in df.columns:
+        df['hours'] = 'Hours not available'
+
+    return df
+
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_meta(meta, meta_path):
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, meta_path)
+
+def snapshot_is_current(source_path, meta, snapshot_dir=SNAPSHOT_DIR):
+    """Check a snapshot against its source file.
+
+    A matching mtime and size is trusted as-is. If only the mtime moved
+    (e.g. the file was copied), the content hash decides, and the stored
+    mtime is refreshed so the next check is cheap again.
+    """
+    if meta is None:
+        return False
+    stat = os.stat(source_path)
+    if stat.st_mtime_ns == meta.get('source_mtime_ns') and stat.st_size == meta.get('source_size'):
+        return True
+    if stat.st_size != meta.get('source_size') or file_sha256(source_path) != meta.get('source_sha256'):
+        return False
+
+    meta['source_mtime_ns'] = stat.st_mtime_ns
+    _write_meta(meta, snapshot_paths(snapshot_dir)[1])
+    return True
+
+def _to_storable(df):
+    """Coerce free-form extra columns to strings so they serialize cleanly."""
+    df = df.copy()
+    known_columns = set(COLUMN_NAMES.values()) | {'hours'}
+    for col in df.columns:
+        if col not in known_columns and df[col].dtype == object:
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+def write_snapshot(df, source_path, snapshot_dir=SNAPSHOT_DIR, source_sha256=None, timings=None):
+    """Atomically write a cleaned DataFrame and its metadata as a snapshot."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    data_path, meta_path = snapshot_paths(snapshot_dir)
+    tmp_path = f'{data_path}.{os.getpid()}.tmp'
+
+    df = df.reset_index(drop=True)
+    if SNAPSHOT_FORMAT == 'arrow':
+        # A single uncompressed record batch keeps every column one
+        # contiguous buffer, so the file can be memory-mapped zero-copy
+        df.to_feather(tmp_path, compression='uncompressed', chunksize=max(len(df), 1))
+    else:
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, data_path)
+
+    stat = os.stat(source_path)
+    meta = {
+        'snapshot_version': SNAPSHOT_VERSION,
+        'format': SNAPSHOT_FORMAT,
+        'source_path': os.path.basename(source_path),
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'source_sha256': source_sha256 or file_sha256(source_path),
+        'rows': len(df),
+        'columns': list(df.columns),
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'timings': {stage: round(seconds, 4) for stage, seconds in (timings or {}).items()}
+    }
+    _write_meta(meta, meta_path)
+    return meta
+
+def read_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    """Read the snapshot DataFrame from disk."""
+    data_path, _ = snapshot_paths(snapshot_dir)
+    if SNAPSHOT_FORMAT == 'arrow':
+        return pd.read_feather(data_path)
+    return pd.read_pickle(data_path)
+
+def build_snapshot(source_path=DATA_FILE, snapshot_dir=SNAPSHOT_DIR):
+    """Read and clean the source spreadsheet and write it as a snapshot."""
+    timings = {}
+    with stage_timer(timings, 'hash'):
+        source_sha256 = file_sha256(source_path)
+    with stage_timer(timings, 'read'):
+        raw = read_source(source_path)
+
+    df = _to_storable(clean_dataframe(raw, timings=timings))
+
+    with stage_timer(timings, 'write'):
+        meta = write_snapshot(df, source_path, snapshot_dir, source_sha256=source_sha256,
+                              timings=timings)
+
+    logger.info(f"Built {SNAPSHOT_FORMAT} snapshot with {meta['rows']} rows from {source_path}")
+    logger.info("Ingest stage timings: " +
+                ", ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items()))
+    return df
+
+def refresh_snapshot(source_path=DATA_FILE, snapshot_dir=SNAPSHOT_DIR):
+    """Rebuild the snapshot if it is missing or stale.
+
+    Returns the freshly built DataFrame, or None when the snapshot on disk
+    is already current. Raises FileNotFoundError when neither the source nor
+    a snapshot exists.
+    """
+    meta = read_snapshot_meta(snapshot_dir)
+
+    if not os.path.exists(source_path):
+        if meta is None:
+            raise FileNotFoundError(f"Data file not found: {source_path}")
+        logger.warning(f"Data file not found, serving existing snapshot: {source_path}")
+        return None
+
+    if snapshot_is_current(source_path, meta, snapshot_dir):
+        return None
+
+    return build_snapshot(source_path, snapshot_dir)
+
+def load_snapshot(source_path=DATA_FILE, snapshot_dir=SNAPSHOT_DIR):
+    """Return the cleaned store DataFrame, rebuilding the snapshot if stale."""
+    df = refresh_snapshot(source_path, snapshot_dir)
+    if df is not None:
+        return df
+    return read_snapshot(snapshot_dir)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the store data snapshot.')
+    parser.add_argument('--source', default=DATA_FILE, help='Excel source file')
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help='Snapshot output directory')
+    parser.add_argument('--force', action='store_true', help='Rebuild even if the snapshot is current')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    if args.force:
+        build_snapshot(args.source, args.snapshot_dir)
+    else:
+        refresh_snapshot(args.source, args.snapshot_dir)
+    meta = read_snapshot_meta(args.snapshot_dir)
+    print(f"Snapshot ready: {meta['rows']} rows ({SNAPSHOT_FORMAT}) in {args.snapshot_dir}")
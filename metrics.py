@@ -0,0 +1,261 @@
+"""Lightweight in-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms are plain locked dicts keyed by label
+values, cheap enough to update on every request. ``Registry.render()``
+produces the text exposition served at /metrics. Counters and gauges can
+also be backed by a callback evaluated at scrape time, for values other
+objects already track (cache hit counts, worker memory).
+
+Metrics are per process: behind a multi-worker server each scrape reports
+the worker that answered it, labelled with its ``pid``.
+
+``SlowRequestProfiler`` is a sampling profiler for individual slow
+requests. A watchdog thread samples the stacks of requests that have run
+longer than a threshold and logs where they spent their time, so fast
+requests pay only for two dict operations.
+"""
+import bisect
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+    def samples(self):
+        """Return ``(name, label_values, value)`` samples.
+
+        With a ``callback``, values are read from it at scrape time; it
+        returns a number, or a ``{label_values: number}`` dict when the
+        metric has labels.
+        """
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [(self.name, labels, value) for labels, value in values.items() if value is not None]
+
+
+class Counter(_Metric):
+    """A monotonically increasing count."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, *labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets, plus their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                # Per-bucket counts (last one is +Inf), sum
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            values = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+
+        samples = []
+        for labels, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', labels, cumulative, ('le', _format_value(float(bound)))))
+            samples.append((f'{self.name}_sum', labels, total))
+            samples.append((f'{self.name}_count', labels, cumulative))
+        return samples
+
+
+class Registry:
+    """A set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self, const_labels=None, pid_label=True):
+        self.metrics = []
+        self.const_labels = tuple((const_labels or {}).items())
+        self.pid_label = pid_label
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs):
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs):
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs):
+        return self.register(Histogram(*args, **kwargs))
+
+    def render(self):
+        const_labels = self.const_labels
+        if self.pid_label:
+            # Read per render: forked workers inherit the registry
+            const_labels += (('pid', os.getpid()),)
+
+        lines = []
+        for metric in self.metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.error(f"Error collecting metric {metric.name}: {e}")
+                continue
+            lines.extend(metric.header())
+            for sample in samples:
+                name, labels, value = sample[:3]
+                extra = const_labels + ((sample[3],) if len(sample) > 3 else ())
+                lines.append(f'{name}{_format_labels(metric.labelnames, labels, extra)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+def process_memory():
+    """Return ``{(kind,): bytes}`` with this process's resident and peak memory."""
+    memory = {}
+    try:
+        with open('/proc/self/statm') as f:
+            memory[('rss',)] = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        memory[('peak_rss',)] = peak if sys.platform == 'darwin' else peak * 1024
+    return memory
+
+
+class SlowRequestProfiler:
+    """Samples the stacks of requests running longer than ``threshold`` seconds."""
+
+    def __init__(self, threshold, interval=0.005, max_depth=40, report_stacks=5):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_depth = max_depth
+        self.report_stacks = report_stacks
+        self.profiled = 0
+        self._active = {}
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def start(self):
+        """Start the sampling thread, once per process."""
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='slow-request-profiler', daemon=True)
+        self._thread.start()
+
+    def begin(self, description):
+        self._active[threading.get_ident()] = (time.perf_counter(), description)
+
+    def end(self):
+        """Finish the current thread's request, returning its report if it was sampled."""
+        thread_id = threading.get_ident()
+        entry = self._active.pop(thread_id, None)
+        with self._lock:
+            samples = self._samples.pop(thread_id, None)
+        if entry is None or not samples:
+            return None
+
+        started, description = entry
+        self.profiled += 1
+        total = sum(samples.values())
+        lines = [f"Slow request {description} took {time.perf_counter() - started:.3f}s; "
+                 f"{total} stack samples after {self.threshold:.3f}s:"]
+        for stack, count in samples.most_common(self.report_stacks):
+            lines.append(f"  {count / total:6.1%}  " + ' <- '.join(reversed(stack[-8:])))
+        report = '\n'.join(lines)
+        logger.warning(report)
+        return report
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None and len(stack) < self.max_depth:
+            code = frame.f_code
+            stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+            frame = frame.f_back
+        # Outermost call first
+        return tuple(reversed(stack))
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.perf_counter()
+            slow = [thread_id for thread_id, (started, _) in list(self._active.items())
+                    if now - started >= self.threshold]
+            if not slow:
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id in slow:
+                    frame = frames.get(thread_id)
+                    if frame is not None and thread_id in self._active:
+                        self._samples.setdefault(thread_id, StackCounter())[self._stack(frame)] += 1
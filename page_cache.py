@@ -0,0 +1,255 @@
+"""Rendered-response cache for pages that only change with the dataset.
+
+Rendered bodies are stored per dataset version, route and arguments in a
+pluggable store and replayed with ETag/Last-Modified headers, answering
+conditional requests with 304 Not Modified.
+
+Stores implement ``get(key)``, ``set(key, page)`` and ``clear()``:
+
+- ``LRUPageStore``: in-process, bounded by entry count and total body size.
+- ``FlaskCachePageStore``: any Flask-Caching backend (filesystem, Redis, or
+  the in-memory 'simple' cache as a local stand-in).
+
+``ErrorPages`` keeps the 404 and error pages, which do not depend on the
+request, rendered once per dataset version, plus a bounded negative cache
+of paths known to be missing.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request
+
+
+class CachedPage:
+    """A rendered response body plus the headers needed to replay it."""
+
+    __slots__ = ('body', 'status', 'mimetype', 'etag', 'headers', 'path')
+
+    def __init__(self, body, status, mimetype, etag, headers, path=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.etag = etag
+        self.headers = headers
+        self.path = path
+
+
+class LRUPageStore:
+    """Thread-safe in-process LRU bounded by entries and total body bytes."""
+
+    def __init__(self, max_entries=2048, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+
+    def set(self, key, page):
+        if len(page.body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self._entries[key] = page
+            self.size += len(page.body)
+            while self._entries and (len(self._entries) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def carry_over(self, rename):
+        """Re-key entries with ``rename(key, page)``, dropping those it maps to None."""
+        with self._lock:
+            entries = OrderedDict()
+            size = 0
+            for key, page in self._entries.items():
+                new_key = rename(key, page)
+                if new_key is not None:
+                    entries[new_key] = page
+                    size += len(page.body)
+            self._entries = entries
+            self.size = size
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FlaskCachePageStore:
+    """Adapter storing pages in a Flask-Caching ``Cache`` instance."""
+
+    def __init__(self, cache, key_prefix='page:', timeout=None):
+        self.cache = cache
+        self.key_prefix = key_prefix
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(self.key_prefix + key)
+
+    def set(self, key, page):
+        self.cache.set(self.key_prefix + key, page, timeout=self.timeout)
+
+    def clear(self):
+        # The cache may be shared with other data (e.g. one Redis), so it is
+        # never flushed. Keys embed the dataset version, so stale pages are
+        # never served and expire by their timeout.
+        pass
+
+
+class PageCache:
+    """Caches successful responses of decorated views for one dataset version.
+
+    ``get_version``, if given, returns the ``(version, last_modified)`` of the
+    dataset serving the current request, so a request that started before a
+    reload never caches its page under the new version.
+    """
+
+    def __init__(self, store, version='', last_modified=None, max_age=300, get_version=None):
+        self.store = store
+        self.version = version
+        self.last_modified = last_modified
+        self.max_age = max_age
+        self.get_version = get_version
+        self.hits = 0
+        self.misses = 0
+
+    def set_version(self, version, last_modified=None, keep=None):
+        """Switch to a new dataset version, dropping pages rendered for the old one.
+
+        Pages whose path satisfies ``keep(path)`` are carried over to the new
+        version instead, when the store supports it.
+        """
+        if version != self.version:
+            if keep is not None and hasattr(self.store, 'carry_over'):
+                prefix = f'{self.version}:'
+
+                def rename(key, page):
+                    if key.startswith(prefix) and page.path is not None and keep(page.path):
+                        return f'{version}:{key[len(prefix):]}'
+                    return None
+
+                self.store.carry_over(rename)
+            else:
+                self.store.clear()
+        self.version = version
+        self.last_modified = last_modified
+
+    def current_version(self):
+        if self.get_version is not None:
+            return self.get_version()
+        return self.version, self.last_modified
+
+    def make_key(self, endpoint, version):
+        args = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+        return f'{version}:{endpoint}:{request.host}{request.path}?{args}'
+
+    def _replay(self, page, last_modified):
+        response = make_response(page.body, page.status)
+        response.mimetype = page.mimetype
+        response.headers.extend(page.headers)
+        response.set_etag(page.etag)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        if 'Cache-Control' not in response.headers and self.max_age is not None:
+            response.headers['Cache-Control'] = f'public, max-age={self.max_age}'
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        """Decorate a view so its 200 responses are cached and revalidated."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version, last_modified = self.current_version()
+            key = self.make_key(view.__name__, version)
+            page = self.store.get(key)
+            if page is not None:
+                self.hits += 1
+                return self._replay(page, last_modified)
+
+            self.misses += 1
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or response.direct_passthrough:
+                return response
+
+            body = response.get_data()
+            etag = f'{version[:12]}-{hashlib.sha1(body).hexdigest()[:16]}'
+            headers = [(name, value) for name, value in response.headers
+                       if name in ('Cache-Control', 'Vary')]
+            page = CachedPage(body, response.status_code, response.mimetype, etag, headers, request.path)
+            self.store.set(key, page)
+            return self._replay(page, last_modified)
+        return wrapper
+
+
+class ErrorPages:
+    """Per-version rendered error pages and a bounded LRU of missing paths.
+
+    ``get_version`` works as for ``PageCache``; entries are keyed by the
+    requesting dataset's version.
+    """
+
+    def __init__(self, version='', max_paths=4096, get_version=None):
+        self.version = version
+        self.max_paths = max_paths
+        self.get_version = get_version
+        self.hits = 0
+        self._pages = {}
+        self._missing = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version):
+        """Switch to a new dataset version, forgetting pages and missing paths."""
+        with self._lock:
+            if version != self.version:
+                self._pages.clear()
+                self._missing.clear()
+            self.version = version
+
+    def current_version(self):
+        if self.get_version is not None:
+            return self.get_version()[0]
+        return self.version
+
+    def response(self, template, status, render):
+        """Return ``template``'s page, calling ``render()`` only on first use."""
+        key = (self.current_version(), template)
+        body = self._pages.get(key)
+        if body is None:
+            body = render()
+            self._pages[key] = body
+        return make_response(body, status)
+
+    def is_missing(self, path):
+        """Return True if ``path`` recently returned 404 for this version."""
+        key = (self.current_version(), path)
+        with self._lock:
+            if key not in self._missing:
+                return False
+            self._missing.move_to_end(key)
+            self.hits += 1
+            return True
+
+    def remember_missing(self, path):
+        if self.max_paths <= 0:
+            return
+        key = (self.current_version(), path)
+        with self._lock:
+            self._missing[key] = None
+            self._missing.move_to_end(key)
+            while len(self._missing) > self.max_paths:
+                self._missing.popitem(last=False)
+
+    def __len__(self):
+        return len(self._missing)
@@ -0,0 +1,71 @@
+"""Compact record types for the processed state/city/store hierarchy.
+
+Records use ``__slots__`` so they carry no per-instance ``__dict__``, keep
+only the fields the templates read, and intern the strings that repeat
+across many rows. Jinja reads them with the same ``obj.field`` syntax it
+used for the old dicts.
+"""
+import sys
+
+# Store columns kept from the cleaned DataFrame, in record order
+STORE_FIELDS = ('name', 'address', 'phone', 'website', 'photo', 'description', 'review_count', 'hours')
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+class Record:
+    """Base class for slotted records."""
+
+    __slots__ = ()
+
+    def to_dict(self):
+        """Return the record's fields as a plain dict."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({getattr(self, 'name', '')!r})"
+
+
+class Store(Record):
+    """A single store listing."""
+
+    __slots__ = STORE_FIELDS
+
+    def __init__(self, name, address, phone, website, photo, description, review_count, hours):
+        self.name = name
+        self.address = address
+        self.phone = phone
+        self.website = website
+        self.photo = photo
+        self.description = description
+        self.review_count = review_count
+        self.hours = _intern(hours)
+
+
+class City(Record):
+    """A city and its stores, ordered by review count."""
+
+    __slots__ = ('name', 'slug', 'store_count', 'total_reviews', 'stores')
+
+    def __init__(self, name, slug, store_count, total_reviews, stores):
+        self.name = _intern(name)
+        self.slug = _intern(slug)
+        self.store_count = store_count
+        self.total_reviews = total_reviews
+        self.stores = stores
+
+
+class State(Record):
+    """A state and its cities, ordered by store count and reviews."""
+
+    __slots__ = ('name', 'slug', 'store_count', 'city_count', 'total_reviews', 'cities')
+
+    def __init__(self, name, slug, store_count, city_count, total_reviews, cities):
+        self.name = _intern(name)
+        self.slug = _intern(slug)
+        self.store_count = store_count
+        self.city_count = city_count
+        self.total_reviews = total_reviews
+        self.cities = cities
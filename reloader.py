@@ -0,0 +1,145 @@
+"""Zero-downtime reloading of the dataset.
+
+Everything the routes read from the data (records, route and search
+indexes, sitemaps, aggregates) is bundled in one immutable ``Dataset``.
+``DatasetReloader`` polls the source spreadsheet and the snapshot metadata
+from a background thread. When either changes, it builds a complete new
+``Dataset`` off the request path and hands it to a swap callback, which
+replaces the single active reference. Requests pin the dataset they
+started with, so each one sees a consistent version from start to finish.
+"""
+import logging
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """One fully built, immutable version of the data and its indexes."""
+
+    __slots__ = ('version', 'last_modified', 'loaded_at', 'df', 'store_table', 'processed_data',
+                 'state_index', 'city_index', 'search_index', 'geo_index', 'gazetteer_version',
+                 'sitemap_builder', 'summary', 'template_context', 'changes')
+
+    def __init__(self, **fields):
+        missing = [name for name in self.__slots__
+                   if name not in fields and name not in ('loaded_at', 'changes')]
+        if missing:
+            raise TypeError(f"Dataset missing fields: {missing}")
+        fields.setdefault('loaded_at', datetime.now())
+        # The incremental.ChangeSet from the dataset this one replaced
+        fields.setdefault('changes', None)
+        for name in self.__slots__:
+            object.__setattr__(self, name, fields[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"Dataset({self.version!r}, states={len(self.processed_data)})"
+
+
+def file_stamp(path):
+    """Return ``(mtime_ns, size)`` for ``path``, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DatasetReloader:
+    """Watches the data source and swaps in a rebuilt dataset when it changes.
+
+    ``build()`` returns a new ``Dataset`` (raising to keep the current one)
+    and ``swap(dataset)`` makes it active. ``source_path`` is the spreadsheet;
+    ``marker_path`` is the snapshot metadata, which changes when the snapshot
+    is rebuilt out of process (e.g. by ``python ingest.py``). ``watch_paths``
+    are other inputs of the build, such as the gazetteer.
+    """
+
+    def __init__(self, build, swap, source_path, marker_path, interval=30, watch_paths=()):
+        self.build = build
+        self.swap = swap
+        self.source_path = source_path
+        self.marker_path = marker_path
+        self.watch_paths = tuple(watch_paths)
+        self.interval = interval
+        self.stamp = self._stamp()
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def _stamp(self):
+        return tuple(file_stamp(path) for path in (self.source_path, self.marker_path) + self.watch_paths)
+
+    def _built_stamp(self, before):
+        # Only the marker is rewritten by the build itself
+        return (before[0], self._stamp()[1]) + before[2:]
+
+    def check(self):
+        """Rebuild and swap the dataset if the watched files changed.
+
+        Returns True when a new dataset was swapped in.
+        """
+        with self._lock:
+            before = self._stamp()
+            if before == self.stamp:
+                return False
+
+            try:
+                dataset = self.build()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.error(f"Dataset reload failed, keeping the current dataset: {e}")
+                # Don't rebuild a broken file on every poll; wait for the next change
+                self.stamp = before
+                return False
+
+            # Building refreshes the snapshot and rewrites the marker itself, so
+            # take the marker stamp afterwards. The other stamps are taken before,
+            # so a file edited mid-build is picked up by the next poll.
+            self.stamp = self._built_stamp(before)
+            self.swap(dataset)
+            self.reloads += 1
+            self.last_error = None
+            logger.info(f"Reloaded dataset {dataset.version}")
+            return True
+
+    def load(self):
+        """Build and swap in the first dataset, recording the files it came from."""
+        with self._lock:
+            before = self._stamp()
+            dataset = self.build()
+            self.stamp = self._built_stamp(before)
+            self.swap(dataset)
+            return dataset
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"Dataset reloader error: {e}")
+
+    def start(self):
+        """Start polling in a daemon thread, once per process."""
+        if self.interval <= 0:
+            return
+        # Threads don't survive fork, so forked workers start their own
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        self._stop.clear()
+        self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name='dataset-reloader', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
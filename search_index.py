@@ -0,0 +1,446 @@
+"""Inverted search index over the processed state/city/store data."""
+import heapq
+import re
+from bisect import bisect_left
+from itertools import islice
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Prefixes longer than this are not indexed; longer query tokens are
+# resolved through their capped prefix and then verified against the name.
+MAX_PREFIX_LENGTH = 12
+
+DEFAULT_PER_PAGE = 24
+MAX_PER_PAGE = 100
+DEFAULT_GROUP_LIMIT = 24
+DEFAULT_SUGGEST_LIMIT = 8
+# Shorter typeahead queries match too many stores to be useful, so they
+# only suggest states and cities
+MIN_SUGGEST_STORE_LENGTH = 3
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    if not text:
+        return []
+    return TOKEN_RE.findall(str(text).lower())
+
+
+def rank_key(name, popularity):
+    """Order of documents with equal match quality: most popular, then by name."""
+    return (-popularity, str(name).lower())
+
+
+class _PrefixIndex:
+    """Maps token prefixes to sorted lists of document ids.
+
+    Removed documents are tombstoned in ``deleted`` rather than purged from
+    the posting lists. ``copy()`` shares posting lists with the original
+    and copies each one only when it is first appended to, so an updated
+    index can be built while the old one keeps serving.
+
+    Documents are added in ``rank_key`` order when the index is built, so
+    the first ``ranked`` ids, and each posting list up to there, are in
+    rank order. ``top()`` walks postings best first and stops early;
+    documents added later by an update are merged in by sorting.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.names = []
+        self.tokens = []
+        self.popularity = []
+        self.deleted = set()
+        # Lowercase name -> ids of documents with exactly that name
+        self.exact = {}
+        self.ranked = 0
+        # Prefixes whose posting lists this index may append to; None means all
+        self._owned = None
+
+    def copy(self):
+        clone = _PrefixIndex.__new__(_PrefixIndex)
+        clone.postings = dict(self.postings)
+        clone.names = list(self.names)
+        clone.tokens = list(self.tokens)
+        clone.popularity = list(self.popularity)
+        clone.deleted = set(self.deleted)
+        clone.exact = dict(self.exact)
+        clone.ranked = self.ranked
+        clone._owned = set()
+        return clone
+
+    def seal(self):
+        """Mark every document added so far as added in rank order."""
+        self.ranked = len(self.names)
+
+    def add(self, name, popularity):
+        """Index a document name and return its id."""
+        doc_id = len(self.names)
+        name_lower = str(name).lower()
+        tokens = tokenize(name_lower)
+
+        self.names.append(name_lower)
+        self.tokens.append(frozenset(tokens))
+        self.popularity.append(popularity)
+        # Tuples, so a copy never appends to the original's entry
+        self.exact[name_lower] = self.exact.get(name_lower, ()) + (doc_id,)
+
+        for token in set(tokens):
+            for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1):
+                prefix = token[:length]
+                posting = self.postings.get(prefix)
+                if posting is None or (self._owned is not None and prefix not in self._owned):
+                    posting = [] if posting is None else posting.copy()
+                    self.postings[prefix] = posting
+                    if self._owned is not None:
+                        self._owned.add(prefix)
+                # Ids are added in increasing order, so only the tail can repeat
+                if not posting or posting[-1] != doc_id:
+                    posting.append(doc_id)
+        return doc_id
+
+    def remove(self, doc_id):
+        self.deleted.add(doc_id)
+
+    def __len__(self):
+        return len(self.names) - len(self.deleted)
+
+    def lookup(self, query_tokens):
+        """Return ids of documents where every query token prefixes a name token."""
+        postings = []
+        for token in query_tokens:
+            posting = self.postings.get(token[:MAX_PREFIX_LENGTH])
+            if not posting:
+                return []
+            postings.append(posting)
+
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if not candidates:
+                return []
+        if self.deleted:
+            candidates -= self.deleted
+
+        long_tokens = [t for t in query_tokens if len(t) > MAX_PREFIX_LENGTH]
+        if long_tokens:
+            candidates = {
+                doc_id for doc_id in candidates
+                if all(any(name_token.startswith(t) for name_token in self.tokens[doc_id])
+                       for t in long_tokens)
+            }
+        return candidates
+
+    def rank(self, doc_ids, query, query_tokens):
+        """Order documents by match quality, then popularity, then name.
+
+        Sorts every document; ``top()`` is the bounded path for a first page.
+        """
+        exact_tokens = set(query_tokens)
+
+        def sort_key(doc_id):
+            name = self.names[doc_id]
+            if name == query:
+                score = 3
+            elif name.startswith(query):
+                score = 2
+            elif exact_tokens <= self.tokens[doc_id]:
+                score = 1
+            else:
+                score = 0
+            return (-score, -self.popularity[doc_id], name, doc_id)
+
+        return sorted(doc_ids, key=sort_key)
+
+    def search(self, query, query_tokens):
+        return self.rank(self.lookup(query_tokens), query, query_tokens)
+
+    def _sort_key(self, doc_id):
+        return (-self.popularity[doc_id], self.names[doc_id], doc_id)
+
+    def _in_rank_order(self, posting):
+        cut = bisect_left(posting, self.ranked)
+        if cut == len(posting):
+            return posting
+        tail = sorted(posting[cut:], key=self._sort_key)
+        return heapq.merge(islice(posting, cut), tail, key=self._sort_key)
+
+    def top(self, query, query_tokens, limit):
+        """Return the first ``limit`` documents in ``search()`` order.
+
+        Exact names come from ``exact``. The rest are walked best first
+        along the shortest posting list, stopping once ``limit`` names
+        start with the query, since no later document can outrank those.
+        """
+        if limit <= 0:
+            return []
+        postings = []
+        for token in query_tokens:
+            posting = self.postings.get(token[:MAX_PREFIX_LENGTH])
+            if not posting:
+                return []
+            postings.append(posting)
+        postings.sort(key=len)
+        others = postings[1:]
+
+        exact = sorted((doc_id for doc_id in self.exact.get(query, ()) if doc_id not in self.deleted),
+                       key=self._sort_key)
+        need = limit - len(exact)
+        if need <= 0:
+            return exact[:limit]
+
+        skip = self.deleted.union(exact) if exact else self.deleted
+        exact_tokens = set(query_tokens)
+        long_tokens = [t for t in query_tokens if len(t) > MAX_PREFIX_LENGTH]
+        # Matches whose name starts with the query, contains every query
+        # token whole, or neither; each in rank order
+        prefixed, whole, partial = [], [], []
+        for doc_id in self._in_rank_order(postings[0]):
+            if doc_id in skip:
+                continue
+            if others and not all(_contains(posting, doc_id) for posting in others):
+                continue
+            if long_tokens and not all(any(name_token.startswith(t) for name_token in self.tokens[doc_id])
+                                       for t in long_tokens):
+                continue
+            if self.names[doc_id].startswith(query):
+                prefixed.append(doc_id)
+                if len(prefixed) >= need:
+                    break
+            elif exact_tokens <= self.tokens[doc_id]:
+                if len(whole) < need:
+                    whole.append(doc_id)
+            elif len(partial) < need:
+                partial.append(doc_id)
+        return (exact + prefixed + whole + partial)[:limit]
+
+
+def _contains(posting, doc_id):
+    i = bisect_left(posting, doc_id)
+    return i < len(posting) and posting[i] == doc_id
+
+
+class SearchIndex:
+    """Token and prefix search over state, city and store names.
+
+    Built once from ``process_data()`` output; queries touch only the
+    posting lists for their tokens instead of scanning every store.
+    ``update()`` derives a new index that re-indexes only changed states.
+    """
+
+    # Rebuild from scratch once tombstones outnumber live documents
+    MAX_DELETED_RATIO = 0.5
+
+    def __init__(self, processed_data):
+        self.states = []
+        self.cities = []
+        self.stores = []
+        self._state_index = _PrefixIndex()
+        self._city_index = _PrefixIndex()
+        self._store_index = _PrefixIndex()
+        # state name -> (state doc id, city doc ids, store doc ids)
+        self._state_docs = {}
+
+        self._add_states(processed_data.items())
+        for index in (self._state_index, self._city_index, self._store_index):
+            index.seal()
+
+    def _add_states(self, states):
+        """Index ``(state_name, state_data)`` pairs, each kind of document in rank order."""
+        state_docs = list(states)
+        city_docs = [(state_name, city, state_data)
+                     for state_name, state_data in state_docs for city in state_data.cities]
+        store_docs = [(state_name, store, city, state_data)
+                      for state_name, city, state_data in city_docs for store in city.stores]
+        state_docs.sort(key=lambda doc: rank_key(doc[0], doc[1].store_count))
+        city_docs.sort(key=lambda doc: rank_key(doc[1].name, doc[1].store_count))
+        store_docs.sort(key=lambda doc: (-(doc[1].review_count or 0), str(doc[1].name).lower()))
+
+        state_ids = {}
+        city_ids = {state_name: [] for state_name, _ in state_docs}
+        store_ids = {state_name: [] for state_name, _ in state_docs}
+        for state_name, state_data in state_docs:
+            self.states.append(state_data)
+            state_ids[state_name] = self._state_index.add(state_name, state_data.store_count)
+        for state_name, city, state_data in city_docs:
+            self.cities.append((city, state_data))
+            city_ids[state_name].append(self._city_index.add(city.name, city.store_count))
+        for state_name, store, city, state_data in store_docs:
+            self.stores.append((store, city, state_data))
+            store_ids[state_name].append(self._store_index.add(store.name, store.review_count or 0))
+
+        for state_name, state_id in state_ids.items():
+            self._state_docs[state_name] = (state_id, city_ids[state_name], store_ids[state_name])
+
+    def _remove_state(self, state_name):
+        docs = self._state_docs.pop(state_name, None)
+        if docs is None:
+            return
+        state_id, city_ids, store_ids = docs
+        self._state_index.remove(state_id)
+        for doc_id in city_ids:
+            self._city_index.remove(doc_id)
+        for doc_id in store_ids:
+            self._store_index.remove(doc_id)
+
+    def update(self, processed_data, state_names):
+        """Return a new index with the given states re-indexed from ``processed_data``.
+
+        This index is left untouched, so requests still using it are
+        unaffected.
+        """
+        index = SearchIndex.__new__(SearchIndex)
+        index.states = list(self.states)
+        index.cities = list(self.cities)
+        index.stores = list(self.stores)
+        index._state_index = self._state_index.copy()
+        index._city_index = self._city_index.copy()
+        index._store_index = self._store_index.copy()
+        index._state_docs = dict(self._state_docs)
+
+        for state_name in state_names:
+            index._remove_state(state_name)
+        index._add_states((state_name, processed_data[state_name])
+                          for state_name in state_names if state_name in processed_data)
+
+        store_index = index._store_index
+        if len(store_index.deleted) > self.MAX_DELETED_RATIO * max(len(store_index), 1):
+            return SearchIndex(processed_data)
+        return index
+
+    @staticmethod
+    def _normalize(query):
+        query = (query or '').strip().lower()
+        return query, tokenize(query)
+
+    @staticmethod
+    def _state_result(state_data):
+        return {
+            'name': state_data.name,
+            'slug': state_data.slug,
+            'store_count': state_data.store_count,
+            'city_count': state_data.city_count
+        }
+
+    @staticmethod
+    def _city_result(city, state_data):
+        return {
+            'name': city.name,
+            'state_name': state_data.name,
+            'state_slug': state_data.slug,
+            'slug': city.slug,
+            'store_count': city.store_count,
+            'total_reviews': city.total_reviews
+        }
+
+    @staticmethod
+    def _store_result(store, city, state_data):
+        store_info = store.to_dict()
+        store_info.update({
+            'city': city.name,
+            'state': state_data.name,
+            'city_slug': city.slug,
+            'state_slug': state_data.slug
+        })
+        return store_info
+
+    def search(self, query, page=1, per_page=DEFAULT_PER_PAGE, group_limit=DEFAULT_GROUP_LIMIT):
+        """Run a ranked search and return one page of store results.
+
+        State and city matches are capped at ``group_limit``; store matches
+        are paginated with at most ``MAX_PER_PAGE`` results per page.
+        """
+        query, query_tokens = self._normalize(query)
+        per_page = max(1, min(int(per_page), MAX_PER_PAGE))
+        page = max(1, int(page))
+
+        results = {
+            'query': query,
+            'states': [],
+            'cities': [],
+            'stores': [],
+            'total_states': 0,
+            'total_cities': 0,
+            'total_stores': 0,
+            'page': page,
+            'per_page': per_page,
+            'pages': 0
+        }
+        if not query_tokens:
+            return results
+
+        # Counting matches is cheap; only the returned ones are ranked
+        state_ids = self._state_index.lookup(query_tokens)
+        city_ids = self._city_index.lookup(query_tokens)
+        store_ids = self._store_index.lookup(query_tokens)
+
+        results['states'] = [self._state_result(self.states[i])
+                             for i in self._state_index.top(query, query_tokens, group_limit)]
+        results['cities'] = [self._city_result(*self.cities[i])
+                             for i in self._city_index.top(query, query_tokens, group_limit)]
+
+        start = (page - 1) * per_page
+        results['stores'] = [self._store_result(*self.stores[i])
+                             for i in self._store_index.top(query, query_tokens, start + per_page)[start:]]
+
+        results['total_states'] = len(state_ids)
+        results['total_cities'] = len(city_ids)
+        results['total_stores'] = len(store_ids)
+        results['pages'] = (len(store_ids) + per_page - 1) // per_page
+        return results
+
+    def matches(self, query, kind):
+        """Return every match of one kind ('states', 'cities' or 'stores') in rank order.
+
+        Items are as held in ``states``, ``cities`` and ``stores``.
+        """
+        query, query_tokens = self._normalize(query)
+        if not query_tokens:
+            return []
+        index, documents = {
+            'states': (self._state_index, self.states),
+            'cities': (self._city_index, self.cities),
+            'stores': (self._store_index, self.stores)
+        }[kind]
+        return [documents[doc_id] for doc_id in index.search(query, query_tokens)]
+
+    def suggest(self, query, limit=DEFAULT_SUGGEST_LIMIT):
+        """Return a short mixed list of state, city and store matches for typeahead."""
+        query, query_tokens = self._normalize(query)
+        limit = max(1, min(int(limit), MAX_PER_PAGE))
+        if not query_tokens:
+            return []
+
+        suggestions = []
+        for doc_id in self._state_index.top(query, query_tokens, limit):
+            state_data = self.states[doc_id]
+            suggestions.append({
+                'type': 'state',
+                'name': state_data.name,
+                'state_slug': state_data.slug,
+                'store_count': state_data.store_count
+            })
+        for doc_id in self._city_index.top(query, query_tokens, limit):
+            city, state_data = self.cities[doc_id]
+            suggestions.append({
+                'type': 'city',
+                'name': city.name,
+                'state': state_data.name,
+                'state_slug': state_data.slug,
+                'city_slug': city.slug,
+                'store_count': city.store_count
+            })
+        if len(query) < MIN_SUGGEST_STORE_LENGTH:
+            return suggestions[:limit]
+        for doc_id in self._store_index.top(query, query_tokens, limit - len(suggestions)):
+            store, city, state_data = self.stores[doc_id]
+            suggestions.append({
+                'type': 'store',
+                'name': store.name,
+                'city': city.name,
+                'state': state_data.name,
+                'state_slug': state_data.slug,
+                'city_slug': city.slug
+            })
+        return suggestions[:limit]
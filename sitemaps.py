@@ -0,0 +1,149 @@
+"""Sharded, streaming XML sitemaps.
+
+/sitemap.xml is a sitemap index pointing at gzip-compressed shards of at
+most SITEMAP_URL_LIMIT URLs each, as the sitemap protocol requires. Shards
+are generated by streaming over a precomputed URL order instead of
+rendering one huge template.
+
+Each city's <lastmod> is the date its stores last changed. A fingerprint of
+every city's rows is kept in a small JSON file next to the snapshot, and a
+city's date only moves when its fingerprint changes between datasets.
+"""
+import gzip
+import io
+import json
+import os
+from xml.sax.saxutils import escape
+
+import pandas as pd
+
+SITEMAP_URL_LIMIT = 50000
+
+# Columns whose changes count as a change to the city's page
+FINGERPRINT_COLUMNS = ['name', 'address', 'phone', 'website', 'photo', 'description', 'review_count', 'hours']
+
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def city_fingerprints(df):
+    """Return ``{(state, city): fingerprint}`` for a cleaned store DataFrame."""
+    if df.empty:
+        return {}
+    columns = [col for col in FINGERPRINT_COLUMNS if col in df.columns]
+    row_hashes = pd.util.hash_pandas_object(df[columns], index=False)
+    # Summing row hashes makes the fingerprint independent of row order
+    city_hashes = row_hashes.groupby([df['state'], df['city']]).sum()
+    return {key: format(int(value) & 0xFFFFFFFFFFFFFFFF, '016x') for key, value in city_hashes.items()}
+
+def load_city_lastmod(path, version, changed_at, fingerprint_source):
+    """Return ``{(state, city): 'YYYY-MM-DD'}`` for the current dataset.
+
+    ``fingerprint_source`` is a callable returning a cleaned DataFrame; it
+    is only called when ``version`` differs from the one last recorded in
+    ``path``, so unchanged datasets just read the JSON file.
+    """
+    try:
+        with open(path) as f:
+            previous = json.load(f)
+    except (OSError, ValueError):
+        previous = {}
+
+    if previous.get('version') == version:
+        return {tuple(key.split('\t', 1)): entry[1] for key, entry in previous['cities'].items()}
+
+    changed_date = changed_at.strftime('%Y-%m-%d')
+    previous_cities = previous.get('cities', {})
+    cities = {}
+    for (state_name, city_name), fingerprint in city_fingerprints(fingerprint_source()).items():
+        key = f'{state_name}\t{city_name}'
+        entry = previous_cities.get(key)
+        if entry is not None and entry[0] == fingerprint:
+            cities[key] = entry
+        else:
+            cities[key] = [fingerprint, changed_date]
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': version, 'cities': cities}, f)
+    os.replace(tmp_path, path)
+
+    return {tuple(key.split('\t', 1)): entry[1] for key, entry in cities.items()}
+
+
+class SitemapBuilder:
+    """Streams the sitemap index and its shards for one dataset version."""
+
+    def __init__(self, processed_data, city_lastmod, default_lastmod, shard_size=SITEMAP_URL_LIMIT):
+        self.shard_size = shard_size
+        self.default_lastmod = default_lastmod
+
+        # (path, lastmod, changefreq, priority) in sitemap order, built once
+        self.entries = []
+        state_entries = []
+        newest = default_lastmod
+        for state_name in sorted(processed_data):
+            state = processed_data[state_name]
+            city_entries = []
+            state_lastmod = None
+            for city in sorted(state.cities, key=lambda c: c.name):
+                lastmod = city_lastmod.get((state_name, city.name), default_lastmod)
+                state_lastmod = max(state_lastmod or lastmod, lastmod)
+                city_entries.append((f'/state/{state.slug}/{city.slug}', lastmod, 'weekly', '0.8'))
+            state_lastmod = state_lastmod or default_lastmod
+            newest = max(newest, state_lastmod)
+            state_entries.append((f'/state/{state.slug}', state_lastmod, 'weekly', '0.9'))
+            state_entries.extend(city_entries)
+
+        self.entries = [
+            ('/', newest, 'daily', '1.0'),
+            ('/about', default_lastmod, 'monthly', '0.8'),
+            ('/search', default_lastmod, 'monthly', '0.8'),
+            ('/sitemap', newest, 'weekly', '0.6')
+        ] + state_entries
+
+    @property
+    def shard_count(self):
+        return max(1, -(-len(self.entries) // self.shard_size))
+
+    def shard_entries(self, shard):
+        start = shard * self.shard_size
+        return self.entries[start:start + self.shard_size]
+
+    def iter_index(self, shard_url):
+        """Yield the sitemap index XML in chunks.
+
+        ``shard_url(n)`` returns the absolute URL of shard ``n``.
+        """
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{SITEMAP_NS}">\n'
+        for shard in range(self.shard_count):
+            entries = self.shard_entries(shard)
+            lastmod = max((entry[1] for entry in entries), default=self.default_lastmod)
+            yield (f'  <sitemap>\n    <loc>{escape(shard_url(shard))}</loc>\n'
+                   f'    <lastmod>{lastmod}</lastmod>\n  </sitemap>\n')
+        yield '</sitemapindex>\n'
+
+    def iter_shard(self, shard, root_url, batch_size=1000):
+        """Yield one shard's urlset XML in chunks of ``batch_size`` URLs."""
+        root_url = root_url.rstrip('/')
+        yield f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{SITEMAP_NS}">\n'
+        batch = []
+        for path, lastmod, changefreq, priority in self.shard_entries(shard):
+            batch.append(f'  <url>\n    <loc>{escape(root_url + path)}</loc>\n'
+                         f'    <lastmod>{lastmod}</lastmod>\n'
+                         f'    <changefreq>{changefreq}</changefreq>\n'
+                         f'    <priority>{priority}</priority>\n  </url>\n')
+            if len(batch) >= batch_size:
+                yield ''.join(batch)
+                batch = []
+        if batch:
+            yield ''.join(batch)
+        yield '</urlset>\n'
+
+    def shard_gzip(self, shard, root_url):
+        """Return one shard as gzip-compressed bytes, compressing as it streams."""
+        buffer = io.BytesIO()
+        with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=6, mtime=0) as gz:
+            for chunk in self.iter_shard(shard, root_url):
+                gz.write(chunk.encode('utf-8'))
+        return buffer.getvalue()
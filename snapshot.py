@@ -0,0 +1,43 @@
+"""Locations and metadata of the cleaned data snapshot.
+
+These helpers are all the serving side needs to find and validate a
+snapshot, and they import nothing heavy, so the web app can check for
+data without loading pandas. Building snapshots lives in ingest.py.
+"""
+import importlib.util
+import json
+import os
+
+# Checked without importing pyarrow, which is slow to import
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+
+SNAPSHOT_FORMAT = 'arrow' if HAS_PYARROW else 'pickle'
+
+# Bump whenever the cleaning rules or column layout change so that existing
+# snapshots are rebuilt instead of served stale.
+SNAPSHOT_VERSION = 2
+
+base_dir = os.path.abspath(os.path.dirname(__file__))
+DATA_FILE = os.path.join(base_dir, 'data', 'SEO_Optimized_Consignment_Stores_Sample_Dataset.xlsx')
+SNAPSHOT_DIR = os.path.join(base_dir, 'data', 'snapshot')
+
+
+def snapshot_paths(snapshot_dir=SNAPSHOT_DIR):
+    """Return the ``(data_path, meta_path)`` pair for a snapshot directory."""
+    extension = 'arrow' if SNAPSHOT_FORMAT == 'arrow' else 'pkl'
+    return (os.path.join(snapshot_dir, f'stores.{extension}'),
+            os.path.join(snapshot_dir, 'stores.json'))
+
+def read_snapshot_meta(snapshot_dir=SNAPSHOT_DIR):
+    """Return the snapshot metadata, or None if there is no usable snapshot."""
+    data_path, meta_path = snapshot_paths(snapshot_dir)
+    if not os.path.exists(data_path) or not os.path.exists(meta_path):
+        return None
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('snapshot_version') != SNAPSHOT_VERSION or meta.get('format') != SNAPSHOT_FORMAT:
+        return None
+    return meta
@@ -0,0 +1,70 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const storeList = document.querySelector('.store-list');
+
+    // Handle Read More functionality, including cards loaded later
+    storeList.addEventListener('click', function(e) {
+        const button = e.target.closest('.read-more-btn');
+        if (!button) {
+            return;
+        }
+        e.preventDefault();
+        const descriptionElement = document.getElementById(button.getAttribute('data-target'));
+        const summary = descriptionElement.querySelector('.store-summary');
+        const full = descriptionElement.querySelector('.store-description-full');
+        const isExpanded = summary.hidden;
+
+        // Swap the summary and the full description
+        summary.hidden = !isExpanded;
+        full.hidden = isExpanded;
+
+        // Update button text and icon
+        button.innerHTML = isExpanded ?
+            'Read More <i class="fas fa-chevron-down"></i>' :
+            'Read Less <i class="fas fa-chevron-down"></i>';
+        button.classList.toggle('expanded');
+
+        // Smooth scroll if expanding
+        if (!isExpanded) {
+            descriptionElement.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+        }
+    });
+
+    // Load later pages as the visitor scrolls; the page links stay as a
+    // fallback for crawlers and browsers without JavaScript
+    const listEnd = document.getElementById('store-list-end');
+    const pager = document.querySelector('.city-pagination');
+    let nextUrl = listEnd && listEnd.dataset.next;
+    if (!nextUrl || !('IntersectionObserver' in window)) {
+        return;
+    }
+    pager.hidden = true;
+    let loading = false;
+    const observer = new IntersectionObserver(function(entries) {
+        if (!entries[0].isIntersecting || loading || !nextUrl) {
+            return;
+        }
+        loading = true;
+        fetch(nextUrl, { headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`Loading stores failed: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                storeList.insertAdjacentHTML('beforeend', data.html);
+                nextUrl = data.next;
+                if (!nextUrl) {
+                    observer.disconnect();
+                }
+            })
+            .catch(() => {
+                observer.disconnect();
+                pager.hidden = false;
+            })
+            .finally(() => {
+                loading = false;
+            });
+    }, { rootMargin: '800px 0px' });
+    observer.observe(listEnd);
+});
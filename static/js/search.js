@@ -0,0 +1,99 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const searchForm = document.getElementById('searchForm');
+    const searchInput = document.getElementById('searchInput');
+
+    const suggestionsList = document.getElementById('searchSuggestions');
+    const suggestUrl = searchForm.dataset.suggestUrl;
+
+    const hideSuggestions = () => {
+        suggestionsList.hidden = true;
+        suggestionsList.innerHTML = '';
+    };
+
+    const renderSuggestions = (suggestions) => {
+        suggestionsList.innerHTML = '';
+        suggestions.forEach(suggestion => {
+            const item = document.createElement('li');
+            const link = document.createElement('a');
+            link.href = suggestion.url;
+            link.textContent = suggestion.type === 'state'
+                ? suggestion.name
+                : `${suggestion.name}, ${suggestion.state}`;
+            const type = document.createElement('span');
+            type.className = 'suggestion-type';
+            type.textContent = suggestion.type;
+            link.appendChild(type);
+            item.appendChild(link);
+            suggestionsList.appendChild(item);
+        });
+        suggestionsList.hidden = suggestions.length === 0;
+    };
+
+    // Fetch typeahead suggestions instead of resubmitting the whole page
+    let searchTimeout;
+    let searchController;
+    searchInput.addEventListener('input', function() {
+        clearTimeout(searchTimeout);
+        if (searchInput.value.trim().length < 2) {
+            hideSuggestions();
+            return;
+        }
+        searchTimeout = setTimeout(() => {
+            if (searchController) {
+                searchController.abort();
+            }
+            searchController = new AbortController();
+            fetch(`${suggestUrl}?q=${encodeURIComponent(searchInput.value)}`, { signal: searchController.signal })
+                .then(response => response.json())
+                .then(data => renderSuggestions(data.suggestions || []))
+                .catch(() => {});
+        }, 250);
+    });
+
+    document.addEventListener('click', (e) => {
+        if (!searchForm.contains(e.target)) {
+            hideSuggestions();
+        }
+    });
+
+    // List the closest cities to the visitor's location
+    const nearMeButton = document.getElementById('nearMeButton');
+    if (nearMeButton && 'geolocation' in navigator) {
+        const nearMeStatus = document.getElementById('nearMeStatus');
+        const nearMeResults = document.getElementById('nearMeResults');
+        const nearUrl = nearMeButton.dataset.nearUrl;
+        const showStatus = (message) => {
+            nearMeStatus.textContent = message;
+            nearMeStatus.hidden = !message;
+        };
+
+        nearMeButton.hidden = false;
+        nearMeButton.addEventListener('click', () => {
+            showStatus('Finding your location...');
+            navigator.geolocation.getCurrentPosition(position => {
+                const { latitude, longitude } = position.coords;
+                fetch(`${nearUrl}?lat=${latitude}&lon=${longitude}&radius=80&limit=10`)
+                    .then(response => response.json())
+                    .then(data => {
+                        const cities = data.cities || [];
+                        nearMeResults.innerHTML = '';
+                        cities.forEach(city => {
+                            const item = document.createElement('li');
+                            const link = document.createElement('a');
+                            link.href = city.url;
+                            link.textContent = `${city.name}, ${city.state_name}`;
+                            const detail = document.createElement('span');
+                            detail.className = 'suggestion-type';
+                            detail.textContent = `${city.store_count} stores \u00b7 ${Math.round(city.distance_km)} km`;
+                            link.appendChild(detail);
+                            item.appendChild(link);
+                            nearMeResults.appendChild(item);
+                        });
+                        nearMeResults.hidden = cities.length === 0;
+                        showStatus(cities.length ? '' : 'No stores found within 80 km.');
+                    })
+                    .catch(() => showStatus('Location search is unavailable right now.'));
+            }, () => showStatus('We could not get your location.'));
+        });
+    }
+});
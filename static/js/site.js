@@ -0,0 +1,20 @@
+// Mobile menu toggle
+document.querySelector('.mobile-menu-toggle').addEventListener('click', function() {
+    document.querySelector('.nav-links').classList.toggle('active');
+});
+
+// Dropdown toggle
+document.querySelectorAll('.dropdown-toggle').forEach(function(button) {
+    button.addEventListener('click', function() {
+        this.nextElementSibling.classList.toggle('active');
+    });
+});
+
+// Close dropdowns when clicking outside
+document.addEventListener('click', function(event) {
+    if (!event.target.closest('.dropdown')) {
+        document.querySelectorAll('.dropdown-menu').forEach(function(menu) {
+            menu.classList.remove('active');
+        });
+    }
+});
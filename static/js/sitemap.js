@@ -0,0 +1,23 @@
+document.addEventListener('DOMContentLoaded', function() {
+    // Accordion functionality
+    const accordionButtons = document.querySelectorAll('.accordion-button');
+
+    accordionButtons.forEach(button => {
+        button.addEventListener('click', () => {
+            const isExpanded = button.getAttribute('aria-expanded') === 'true';
+            button.setAttribute('aria-expanded', !isExpanded);
+        });
+    });
+
+    // URL hash handling
+    if (window.location.hash) {
+        const stateSection = document.querySelector(window.location.hash);
+        if (stateSection) {
+            const button = stateSection.querySelector('.accordion-button');
+            if (button) {
+                button.setAttribute('aria-expanded', 'true');
+                stateSection.scrollIntoView({ behavior: 'smooth' });
+            }
+        }
+    }
+});
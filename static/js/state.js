@@ -0,0 +1,37 @@
+document.addEventListener('DOMContentLoaded', function() {
+    const citySearch = document.getElementById('citySearch');
+    const sortSelect = document.getElementById('sortCities');
+    const citiesGrid = document.querySelector('.cities-grid');
+    const cityCards = Array.from(document.querySelectorAll('.city-card'));
+
+    // Search functionality
+    citySearch.addEventListener('input', filterCities);
+
+    // Sort functionality
+    sortSelect.addEventListener('change', sortCities);
+
+    function filterCities() {
+        const searchTerm = citySearch.value.toLowerCase();
+
+        cityCards.forEach(card => {
+            const cityName = card.dataset.name.toLowerCase();
+            card.style.display = cityName.includes(searchTerm) ? 'block' : 'none';
+        });
+    }
+
+    function sortCities() {
+        const sortBy = sortSelect.value;
+
+        const sortedCards = cityCards.sort((a, b) => {
+            if (sortBy === 'stores') {
+                return b.dataset.stores - a.dataset.stores;
+            } else if (sortBy === 'reviews') {
+                return b.dataset.reviews - a.dataset.reviews;
+            } else {
+                return a.dataset.name.localeCompare(b.dataset.name);
+            }
+        });
+
+        sortedCards.forEach(card => citiesGrid.appendChild(card));
+    }
+});
@@ -0,0 +1,111 @@
+"""Read-only store table shared between worker processes.
+
+The Arrow snapshot written by ingest.py is memory-mapped instead of being
+loaded into pandas, so every worker on the box reads the same page-cache
+pages rather than holding its own copy of every store row. Stores are
+exposed as lightweight views that read their fields from the mapped
+columns on access.
+
+Requires pyarrow.
+"""
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+import pyarrow as pa
+
+from records import STORE_FIELDS
+
+
+class StoreTable:
+    """A memory-mapped Arrow IPC file of cleaned store rows."""
+
+    def __init__(self, path):
+        self.path = path
+        self._source = pa.memory_map(path, 'r')
+        self._table = pa.ipc.open_file(self._source).read_all()
+        self._columns = {name: self._table.column(name) for name in self._table.column_names}
+        self.column_names = tuple(self._table.column_names)
+        self.num_rows = self._table.num_rows
+
+    def __len__(self):
+        return self.num_rows
+
+    def value(self, column, row):
+        """Return one field of one row as a Python value."""
+        return self._columns[column][row].as_py()
+
+    def frame(self, columns):
+        """Materialize a few columns as a DataFrame indexed by row position."""
+        return self._table.select(columns).to_pandas()
+
+    def rows(self, positions):
+        """Return a sequence of store views for the given row positions."""
+        return StoreRows(self, positions)
+
+    def close(self):
+        self._columns = {}
+        self._table = None
+        self._source.close()
+
+
+class StoreView(Mapping):
+    """Dict-like, read-only view of one row in a StoreTable."""
+
+    __slots__ = ('_table', '_row')
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, key):
+        if key not in self._table._columns:
+            raise KeyError(key)
+        return self._table.value(key, self._row)
+
+    def __getattr__(self, name):
+        # Attribute access mirrors records.Store (store.name, store.photo, ...)
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self):
+        return iter(self._table.column_names)
+
+    def __len__(self):
+        return len(self._table.column_names)
+
+    def to_dict(self):
+        """Return the row's store fields as a plain dict, like records.Store.to_dict."""
+        return {field: self[field] for field in STORE_FIELDS}
+
+    def __repr__(self):
+        return f"StoreView(row={self._row})"
+
+
+class StoreRows(Sequence):
+    """An ordered list of StoreTable rows, stored as an array of positions."""
+
+    __slots__ = ('_table', '_rows')
+
+    def __init__(self, table, positions):
+        self._table = table
+        self._rows = np.asarray(positions, dtype=np.int64)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return StoreRows(self._table, self._rows[index])
+        return StoreView(self._table, int(self._rows[index]))
+
+    def __iter__(self):
+        table = self._table
+        for row in self._rows.tolist():
+            yield StoreView(table, row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __repr__(self):
+        return f"StoreRows({len(self)} stores)"
@@ -0,0 +1,96 @@
+"""Dataset-wide aggregates computed once per dataset version.
+
+Totals, per-state counts, the most popular states and cities and the
+region rollups are derived from ``process_data()`` output when a dataset
+is loaded, so templates and routes read precomputed values instead of
+re-scanning every state and city on each render.
+"""
+from types import MappingProxyType
+
+POPULAR_STATES_LIMIT = 5
+POPULAR_CITIES_LIMIT = 6
+# States and cities suggested on the 404 and error pages
+SUGGESTED_LIMIT = 5
+
+
+class RegionSummary:
+    """Store and city totals for the states of one region present in the data."""
+
+    __slots__ = ('name', 'states', 'store_count', 'city_count')
+
+    def __init__(self, name, states):
+        object.__setattr__(self, 'name', name)
+        object.__setattr__(self, 'states', tuple(states))
+        object.__setattr__(self, 'store_count', sum(state.store_count for state in self.states))
+        object.__setattr__(self, 'city_count', sum(state.city_count for state in self.states))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"RegionSummary({self.name!r})"
+
+
+class DatasetSummary:
+    """Immutable aggregates over one version of the processed data."""
+
+    __slots__ = ('total_stores', 'total_cities', 'total_states', 'total_reviews',
+                 'state_counts', 'popular_states', 'popular_cities', 'suggested_states', 'suggested_cities', 'regions',
+                 'template_context')
+
+    def __init__(self, processed_data, regions, popular_states=POPULAR_STATES_LIMIT,
+                 popular_cities=POPULAR_CITIES_LIMIT):
+        states = list(processed_data.values())
+        # sorted() is stable, so ties keep processed_data order as before
+        states_by_count = sorted(states, key=lambda state: state.store_count, reverse=True)
+
+        cities = [
+            MappingProxyType({
+                'name': city.name,
+                'state': state_data.name,
+                'state_slug': state_data.slug,
+                'slug': city.slug,
+                'store_count': city.store_count,
+                'total_reviews': city.total_reviews
+            })
+            for state_data in states
+            for city in state_data.cities
+        ]
+        cities.sort(key=lambda city: (city['store_count'], city['total_reviews']), reverse=True)
+
+        values = {
+            'total_stores': sum(state.store_count for state in states),
+            'total_cities': sum(state.city_count for state in states),
+            'total_states': len(states),
+            'total_reviews': sum(state.total_reviews for state in states),
+            'state_counts': MappingProxyType({state.name: state.store_count for state in states}),
+            'popular_states': tuple(state.name for state in states_by_count[:popular_states]),
+            'popular_cities': tuple(cities[:popular_cities]),
+            'suggested_states': tuple(states_by_count[:SUGGESTED_LIMIT]),
+            'suggested_cities': tuple(cities[:SUGGESTED_LIMIT]),
+            'regions': MappingProxyType({
+                region: RegionSummary(region, [processed_data[name] for name in names
+                                               if name in processed_data])
+                for region, names in regions.items()
+            })
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+        object.__setattr__(self, 'template_context', MappingProxyType({
+            'summary': self,
+            'total_stores': self.total_stores,
+            'total_cities': self.total_cities,
+            'total_states': self.total_states,
+            'state_counts': self.state_counts,
+            'popular_states': self.popular_states,
+            'suggested_states': self.suggested_states,
+            'suggested_cities': self.suggested_cities
+        }))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return (f"DatasetSummary(states={self.total_states}, cities={self.total_cities}, "
+                f"stores={self.total_stores})")